@@ -0,0 +1,67 @@
+'''
+Замер холодного импорта модулей рейтинга (python -X importtime в отдельном процессе)
+и проверка, что тяжелые зависимости не подгружаются при импорте.
+
+    python -m benchmarks.importtime [--budget 150] [module ...]
+
+Без аргументов замеряются entropy.rating, magistraytik.rating_new_scoring
+и magistraytik.rating_old_scoring.
+'''
+import argparse
+import subprocess
+import sys
+
+MODULES = ["entropy.rating", "magistraytik.rating_new_scoring", "magistraytik.rating_old_scoring"]
+LAZY = ["pandas", "bs4", "lxml", "requests_toolbelt"]
+TOP = 8
+# бюджет холодного импорта модуля рейтинга, мс (сейчас около 100 мс)
+BUDGET_MS = 150
+
+
+def import_profile(module: str):
+    '''Функция импортирует модуль в чистом процессе: (время импорта в мкс, мкс по пакетам-зависимостям, подгруженные LAZY).'''
+    check = f"import sys, {module}; print(','.join(m for m in {LAZY!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", check],
+                          capture_output=True, text=True, check=True)
+    total = 0
+    packages = {}
+    for line in proc.stderr.splitlines():
+        fields = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        cumulative, name = int(fields[1]), fields[2].strip()
+        if name == module:
+            total = cumulative
+            continue
+        # вложенные импорты выводятся раньше родителя, поэтому по пакету берется максимум
+        package = name.split(".")[0]
+        packages[package] = max(packages.get(package, 0), cumulative)
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return total, packages, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="допустимое время импорта, мс")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        total, packages, loaded = import_profile(module)
+        total /= 1000
+        packages.pop("site", None)
+        print(f"{module}: {total:.1f} ms")
+        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:TOP]:
+            print(f"  {name:<32} {us / 1000:8.1f} ms")
+        if loaded:
+            print(f"  heavy imports loaded: {', '.join(loaded)}")
+            failed = True
+        if total > args.budget:
+            print(f"  over budget: {total:.1f} ms > {args.budget:.1f} ms")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+'''
+Замер времени get_rating на записанных ответах mafiauniverse.org без выхода в сеть.
+
+Запись ответов сайта (нужен доступ к mafiauniverse.org):
+
+    python -m benchmarks.latency record recordings/mafiauniverse
+
+Прогон на локальном сервере, отдающем запись с задержкой:
+
+    python -m benchmarks.latency run recordings/mafiauniverse --latency 0.08 --jitter 0.02 --repeat 10
+
+Без --warm кэш серий, снимки и номера сезонов очищаются перед каждым прогоном.
+'''
+import argparse
+import importlib
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("MAFIA_CACHE_DIR", tempfile.mkdtemp(prefix="mafia_bench_"))
+
+from mafiauniverse.replay import Recording, RecordingSession, ReplayServer
+from mafiauniverse.seasons import default_directory
+
+TARGETS = {
+    "entropy": ("entropy.rating", lambda module, session: module.get_rating(session=session)),
+    "magistraytik": ("magistraytik.rating_new_scoring", lambda module, session: module.get_rating([], session=session)),
+}
+
+
+def record(args):
+    recording = Recording(args.path)
+    for name in args.targets:
+        module_name, call = TARGETS[name]
+        call(importlib.import_module(module_name), RecordingSession(recording))
+    recording.save()
+    print(f"recorded {len(recording.entries)} responses into {args.path}")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def clear_cache():
+    cache_dir = os.environ["MAFIA_CACHE_DIR"]
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(cache_dir, exist_ok=True)
+    default_directory().invalidate()
+
+
+def run(args):
+    recording = Recording(args.path)
+    with ReplayServer(recording, latency=args.latency, jitter=args.jitter) as server:
+        for name in args.targets:
+            module_name, call = TARGETS[name]
+            module = importlib.import_module(module_name)
+            module.MAIN_URL = server.url
+            if hasattr(module, "Season"):
+                module.Season.MAIN_URL = server.url
+            timings, requests_count, bytes_sent = [], [], []
+            for _ in range(args.repeat):
+                if not args.warm:
+                    clear_cache()
+                server.reset_counters()
+                start = time.perf_counter()
+                call(module, None)
+                timings.append(time.perf_counter() - start)
+                requests_count.append(server.requests)
+                bytes_sent.append(server.bytes_sent)
+                if server.misses:
+                    print(f"{name}: not recorded: {server.misses}", file=sys.stderr)
+            print(
+                f"{name}: p50 {percentile(timings, 0.5) * 1000:.1f} ms, "
+                f"p95 {percentile(timings, 0.95) * 1000:.1f} ms, "
+                f"requests {statistics.mean(requests_count):.1f}, "
+                f"bytes {statistics.mean(bytes_sent) / 1024:.1f} KiB"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="записать ответы mafiauniverse.org")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    record_parser.set_defaults(handler=record)
+    run_parser = commands.add_parser("run", help="замерить get_rating на записи")
+    run_parser.add_argument("path")
+    run_parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    run_parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа, с")
+    run_parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки, с")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--warm", action="store_true", help="не очищать кэш между прогонами")
+    run_parser.set_defaults(handler=run)
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
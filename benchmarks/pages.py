@@ -0,0 +1,49 @@
+import random
+from typing import List
+
+SEASON_LINK = '<a class="fw-bold" href="/Tournament/{id}">{name} серия {num}</a>'
+RESULT_CELL = "<td>\n    {}\n</td>"
+
+
+def nicknames(count: int) -> List[str]:
+    return [f"Игрок {i}" for i in range(count)]
+
+
+def season_page(name: str, tournament_ids: List[int]) -> bytes:
+    '''Синтетическая страница сезона: ссылки на серии от новой к старой, как на МЮ.'''
+    links = "\n".join(
+        SEASON_LINK.format(id=tour_id, name=name, num=num)
+        for num, tour_id in reversed(list(enumerate(tournament_ids, start=1)))
+    )
+    return f"<html><head><meta charset='utf-8'><title>{name}</title></head><body>{links}</body></html>".encode()
+
+
+def results_page(title: str, players: List[str], rnd: random.Random) -> bytes:
+    '''Синтетическая страница серии с TournResultsTable в разметке МЮ.'''
+    rows = []
+    for place, nick in enumerate(players, start=1):
+        games = rnd.randint(8, 12)
+        wins = rnd.randint(0, games)
+        cells = [
+            str(place),
+            f'<a href="/Player/{abs(hash(nick)) % 10 ** 6}">{nick}</a>',
+            f"{rnd.uniform(0, 25):.2f}".replace('.', ','),
+            f"{rnd.uniform(-1, 4):.2f}".replace('.', ','),
+            *[f"{rnd.uniform(0, 5):.2f}".replace('.', ',') for _ in range(5)],
+            f"{wins} / {games}",
+        ]
+        rows.append("<tr>" + "".join(RESULT_CELL.format(cell) for cell in cells) + "</tr>")
+    return (
+        f"<html><head><meta charset='utf-8'><title>{title}</title></head><body>"
+        "<table id='TournResultsTable'><thead><tr><th>#</th><th>Игрок</th></tr></thead>"
+        f"<tbody>{''.join(rows)}</tbody></table></body></html>"
+    ).encode()
+
+
+def random_results_pages(series_count: int, players_count: int, table_size: int = 10, seed: int = 0) -> List[bytes]:
+    rnd = random.Random(seed)
+    pool = nicknames(players_count)
+    return [
+        results_page(f"Магистрейтик 1 сезон серия {num}", rnd.sample(pool, min(table_size, players_count)), rnd)
+        for num in range(1, series_count + 1)
+    ]
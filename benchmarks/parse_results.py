@@ -0,0 +1,68 @@
+'''
+Сверка и замер разбора TournResultsTable: прежний разбор через BeautifulSoup
+против mafiauniverse.tables на записанных страницах серий.
+
+    python -m benchmarks.parse_results [page.html ...]
+
+Без аргументов используются синтетические страницы.
+'''
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from benchmarks.pages import random_results_pages
+from mafiauniverse.tables import extract_results
+
+
+def reference_results(html_content: bytes):
+    '''Прежний разбор из entropy/rating.py.'''
+    soup = BeautifulSoup(html_content, "html.parser")
+    result_table = soup.find("table", {"id": "TournResultsTable"})
+    rows = []
+    for row in result_table.find('tbody').find_all('tr'):
+        elements = list(map(lambda x: x.text.strip(), row.find_all('td')))
+        place = int(elements[0])
+        nick = elements[1]
+        points = float(elements[2].replace(',', '.'))
+        dops = float(elements[3].replace(',', '.'))
+        wins = int(re.compile("[0-9]+").findall(elements[9])[0])
+        games = int(re.compile("[0-9]+").findall(elements[9])[1])
+        rows.append((place, nick, points, dops, wins, games))
+    return soup.title.text, rows
+
+
+def timed(parse, pages):
+    start = time.perf_counter()
+    results = [parse(page) for page in pages]
+    return results, time.perf_counter() - start
+
+
+def main(paths):
+    if paths:
+        pages = []
+        for path in paths:
+            with open(path, "rb") as f:
+                pages.append(f.read())
+    else:
+        pages = random_results_pages(200, 300, table_size=10)
+
+    reference, reference_time = timed(reference_results, pages)
+    fast, fast_time = timed(extract_results, pages)
+    mismatches = [
+        i for i, (old, new) in enumerate(zip(reference, fast))
+        if old[0] != new[0] or old[1] != [tuple(row) for row in new[1]]
+    ]
+    print(f"pages: {len(pages)}")
+    print(f"BeautifulSoup: {reference_time * 1000:.1f} ms, lxml: {fast_time * 1000:.1f} ms, "
+          f"speedup: {reference_time / fast_time:.1f}x")
+    if mismatches:
+        print(f"mismatched pages: {[paths[i] if paths else i for i in mismatches]}")
+        return 1
+    print("results match")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,182 @@
+'''
+Замер стадий расчета рейтинга на синтетических сезонах растущего размера
+(от 10 до 10 000 серий, от 10 до 100 000 игроков) со сравнением с сохраненным эталоном.
+
+    python -m benchmarks.scale                      # сравнить с benchmarks/baseline.json
+    python -m benchmarks.scale --save               # перезаписать эталон
+    python -m benchmarks.scale --scales 10x10 1000x10000 --tolerance 2
+
+Для каждой стадии замеряются время (лучший из --repeat прогонов) и пик памяти
+(tracemalloc, отдельным прогоном).
+Стадия медленнее эталона больше чем в tolerance раз, рост пика памяти больше чем
+в tolerance раз или расхождение итоговых таблиц с эталоном - ошибка (код возврата 1).
+Время зависит от машины: эталон стоит пересохранять на той машине, где идет сравнение.
+'''
+import argparse
+import gc
+import hashlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import entropy.rating as entropy
+import magistraytik.rating_new_scoring as magistraytik
+import magistraytik.rating_old_scoring as magistraytik_old
+from benchmarks.pages import random_results_pages, season_page
+from mafiauniverse.engine import EntropyFormula, MagistraytikFormula, RatingEngine
+from mafiauniverse.players import PlayerRegistry
+
+SCALES = ["10x10", "100x1000", "1000x10000", "10000x100000"]
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# стадии короче этого не считаются регрессией по времени - это шум таймера
+MIN_SECONDS = 0.02
+
+
+class TimedFormula():
+    '''Обертка формулы, которая копит время, проведенное в самой формуле.'''
+
+    def __init__(self, formula):
+        self.formula = formula
+        self.series_columns = formula.series_columns
+        self.seconds = 0.0
+
+    def __call__(self, before, series):
+        start = time.perf_counter()
+        result = self.formula(before, series)
+        self.seconds += time.perf_counter() - start
+        return result
+
+
+def fold(formula: TimedFormula, parsed):
+    '''Свертка серий движком так же, как это делает Season.apply_series.'''
+    formula.seconds = 0.0
+    engine = RatingEngine(formula, registry=PlayerRegistry())
+    for tour, rows in enumerate(parsed, start=1):
+        engine.apply_series(
+            tour,
+            nicks=[row[1] for row in rows],
+            place=[row[0] for row in rows],
+            points=[row[2] for row in rows],
+            dops=[row[3] for row in rows],
+            wins=[row[4] for row in rows],
+            games=[row[5] for row in rows],
+        )
+    return engine
+
+
+def digest(value) -> str:
+    return hashlib.sha1(json.dumps(value, ensure_ascii=False).encode()).hexdigest()
+
+
+def stages(series_count: int, players_count: int):
+    '''Стадии расчета по порядку: имя и функция от результатов предыдущих стадий.'''
+    season = season_page("Энтропия 1 сезон", list(range(1, series_count + 1)))
+    pages = random_results_pages(series_count, players_count)
+    entropy_formula = TimedFormula(EntropyFormula(entropy.PLACE_FINE))
+    magistraytik_formula = TimedFormula(MagistraytikFormula(magistraytik.TOP_DISTRIBUTION))
+    return [
+        ("parse_tournament_links", lambda out: entropy.Season.parse_tournament_links(season)),
+        ("parse_tour_results", lambda out: [entropy.parse_tour_results(page) for page in pages]),
+        ("parse_series", lambda out: [magistraytik_old.parse_series_rows(page) for page in pages]),
+        ("fold_entropy", lambda out: fold(entropy_formula, out["parse_tour_results"])),
+        ("rating_formula_entropy", lambda out: entropy_formula.seconds),
+        ("fold_magistraytik", lambda out: fold(magistraytik_formula, out["parse_tour_results"])),
+        ("rating_formula_magistraytik", lambda out: magistraytik_formula.seconds),
+        ("calculate_rating", lambda out: magistraytik_old.fold_series(out["parse_series"], frozenset(),
+                                                                      PlayerRegistry())),
+        ("current_rating", lambda out: {
+            name: entropy.Season.current_rating.fget(SimpleNamespace(engine=out[f"fold_{name}"]))
+            for name in ("entropy", "magistraytik")
+        }),
+    ]
+
+
+def run_scale(scale: str, repeat: int = 3) -> dict:
+    series_count, players_count = map(int, scale.split("x"))
+    out, report = {}, {}
+    for name, stage in stages(series_count, players_count):
+        if name.startswith("rating_formula"):
+            # время формулы накоплено внутри свертки, отдельного прогона нет
+            report[name] = {"seconds": stage(out), "peak_kib": 0}
+            continue
+        # сначала прогон под tracemalloc, затем лучший из repeat чистых замеров времени
+        tracemalloc.start()
+        stage(out)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        seconds = float("inf")
+        gc.disable()  # как в timeit: сборщик мусора не попадает в замер
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                out[name] = stage(out)
+                seconds = min(seconds, time.perf_counter() - start)
+        finally:
+            gc.enable()
+        report[name] = {"seconds": seconds, "peak_kib": peak // 1024}
+    old_rating = {nick: round(rating, 6) for nick, rating, _, _, _ in out["calculate_rating"].standings()}
+    report["digests"] = {
+        "links": digest(out["parse_tournament_links"]),
+        "current_rating": digest(out["current_rating"]),
+        "old_rating": digest(sorted(old_rating.items())),
+    }
+    return report
+
+
+def compare(scale: str, report: dict, baseline: dict, tolerance: float) -> list:
+    problems = []
+    for key, value in report["digests"].items():
+        if baseline["digests"].get(key) != value:
+            problems.append(f"{scale}: {key} differs from baseline")
+    for name, stats in report.items():
+        if name == "digests" or name not in baseline:
+            continue
+        old = baseline[name]
+        if stats["seconds"] > max(old["seconds"] * tolerance, MIN_SECONDS):
+            problems.append(f"{scale}: {name} {stats['seconds']:.3f} s, baseline {old['seconds']:.3f} s")
+        if old["peak_kib"] and stats["peak_kib"] > old["peak_kib"] * tolerance:
+            problems.append(f"{scale}: {name} peak {stats['peak_kib']} KiB, baseline {old['peak_kib']} KiB")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=SCALES, help="серии x игроки")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="сохранить результаты как эталон")
+    parser.add_argument("--tolerance", type=float, default=2.0)
+    parser.add_argument("--repeat", type=int, default=3, help="время стадии - лучший из repeat прогонов")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    problems = []
+    run_scale(SCALES[0], 1)  # прогрев: ленивые импорты и первые вызовы не попадают в замер
+    for scale in args.scales:
+        report = run_scale(scale, args.repeat)
+        print(scale)
+        for name, stats in report.items():
+            if name != "digests":
+                print(f"  {name:<28} {stats['seconds'] * 1000:10.1f} ms {stats['peak_kib']:10d} KiB")
+        if args.save:
+            baseline[scale] = report
+        elif scale in baseline:
+            problems += compare(scale, report, baseline[scale], args.tolerance)
+        else:
+            print(f"  no baseline for {scale}")
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.baseline}")
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
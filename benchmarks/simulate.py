@@ -0,0 +1,46 @@
+'''
+Замер скорости Монте-Карло прогноза финалистов на синтетическом сезоне.
+
+    python -m benchmarks.simulate [--scenarios 200000] [--processes 4]
+'''
+import argparse
+import time
+
+from benchmarks.pages import random_results_pages
+from entropy.rating import PLACE_FINE
+from magistraytik.rating_new_scoring import TOP_DISTRIBUTION
+from mafiauniverse.engine import EntropyFormula, MagistraytikFormula, RatingEngine
+from mafiauniverse.simulate import simulate_finalists
+from mafiauniverse.tables import extract_results
+
+
+def season_engine(formula, series_count: int, players_count: int) -> RatingEngine:
+    engine = RatingEngine(formula)
+    for tour, page in enumerate(random_results_pages(series_count, players_count), start=1):
+        _, rows = extract_results(page)
+        engine.apply_series(tour, *zip(*((row.nick, row.place, row.points, row.dops, row.wins, row.games)
+                                         for row in rows)))
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=12)
+    parser.add_argument("--players", type=int, default=60)
+    parser.add_argument("--remaining", type=int, default=6)
+    parser.add_argument("--scenarios", type=int, default=200_000)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    for name, formula in (("entropy", EntropyFormula(PLACE_FINE)), ("magistraytik", MagistraytikFormula(TOP_DISTRIBUTION))):
+        engine = season_engine(formula, args.series, args.players)
+        start = time.perf_counter()
+        chances = simulate_finalists(engine, args.remaining, scenarios=args.scenarios, seed=0,
+                                     processes=args.processes)
+        elapsed = time.perf_counter() - start
+        leaders = ", ".join(f"{nick} {p:.2f}" for nick, p in list(chances.items())[:3])
+        print(f"{name}: {args.scenarios / elapsed:,.0f} scenarios/s ({leaders})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,208 +1,151 @@
 import requests
-from bs4 import BeautifulSoup
-from lxml import etree
-import pandas as pd
-from math import ceil
-from datetime import datetime
-
-from requests_toolbelt import MultipartEncoder
-import random
+
 import re
-import string
+from typing import Iterable, Iterator
+
+from mafiauniverse.cache import TournamentCache
+from mafiauniverse.engine import FINAL_MIN_SERIES, EntropyFormula, Standings
+from mafiauniverse.fetch import MAX_WORKERS
+from mafiauniverse.players import PlayerRegistry
+from mafiauniverse.profiling import traced
+from mafiauniverse.search import search_series
+from mafiauniverse import seasons
+from mafiauniverse.season import SeasonBase, open_season
+from mafiauniverse.service import RatingService
+from mafiauniverse.tables import extract_links, extract_results
+from mafiauniverse.watch import SeasonWatcher
+from scraping.transport import default_transport
 
 MAIN_URL = "https://mafiauniverse.org"
+OUT_OF_COMPETITION = re.compile(r"вне зачета", re.IGNORECASE)
+PLACE_FINE = {
+    1: 20,
+    2: 15,
+    3: 10,
+    4: 0,
+    5: -10,
+    6: -15,
+    7: -20,
+    8: -25,
+    9: -30,
+    10: -35
+}
 
 def get_series(session: requests.Session):
     '''функция делает HTTP-запрос к веб-серверу для получения данных о сыгранных сериях в сезоне. '''
-    token_request = session.get(F"{MAIN_URL}/SerieOfTournaments/")
-    parser = etree.HTMLParser()
-    tree = etree.fromstring(token_request.text, parser)
-    verificationToken = tree.xpath(
-        '//form//input[@name="__RequestVerificationToken"]/@value'
-    )[0]
-    session_cookies = token_request.cookies
-    fields = {
-        "Page": "1",
-        "Year": str(datetime.now().year),
-        "searchText": "Энтропия",
-        "PageSize": "25",
-    }
-    boundary = "----WebKitFormBoundary" + "".join(
-        random.sample(string.ascii_letters + string.digits, 16)
-    )
-    m = MultipartEncoder(fields=fields, boundary=boundary)
-    headers = {
-        "requestverificationtoken": str(verificationToken),
-        "Content-Type": m.content_type,
-    }
-    return session.post(
-        f"{MAIN_URL}/SerieOfTournaments/Search",
-        cookies=session_cookies,
-        headers=headers,
-        data=m,
-    )
+    return search_series(session, MAIN_URL, "Энтропия")
 
 def parse_season(html_content: bytes):
     '''Функция находит ссылочный номер (не порядковый) сезона.'''
-    soup = BeautifulSoup(html_content, "html.parser")
-    for a_link in soup.find_all("a"):
-        if re.compile(r"энтропия", re.IGNORECASE).findall(a_link.text):
-            sot_num = re.compile("[0-9]+").findall(a_link["href"])
+    for href, text in extract_links(html_content):
+        if re.compile(r"энтропия", re.IGNORECASE).findall(text):
+            sot_num = re.compile("[0-9]+").findall(href or "")
     return int(sot_num[0])
 
-class Season():
+def current_season(session: requests.Session) -> int:
+    '''Функция возвращает ссылочный номер текущего сезона: из кэша сезонов или поиском на сайте.'''
+    return seasons.current_season(session, MAIN_URL, "Энтропия", parse_season)
+
+def parse_tour_results(html_content: bytes):
+    '''Функция достает строки таблицы результатов серии: место, ник, баллы, допы, победы, игры'''
+    _, rows = extract_results(html_content)
+    return rows
+
+class Season(SeasonBase):
     '''
-    Parameters
-    ----------
-    link_season_num : int
-        Номер сезона магистрейтика в ссылке на МЮ
-    exclude : list[str]
-        Список игроков вне зачета
+    Сезон Энтропии, параметры - как у SeasonBase (формула - EntropyFormula со штрафами PLACE_FINE).
     '''
+    NAME = "Энтропия"
+    NAMESPACE = "entropy"
+
+    def __init__(self, session, link_season_num, max_workers: int = MAX_WORKERS,
+                 cache: TournamentCache = None, snapshot_path: str = None, registry: PlayerRegistry = None,
+                 calculate: bool = True):
+
+        self.place_fine = dict(PLACE_FINE)
+
+        super().__init__(session, link_season_num, EntropyFormula(self.place_fine), max_workers,
+                         cache, snapshot_path, registry, calculate)
+
+    parse_season = staticmethod(parse_season)
+    parse_tour_results = staticmethod(parse_tour_results)
 
-    def __init__(self, session, link_season_num):
-
-        self._link_season_num = link_season_num
-        response = session.get(f"{MAIN_URL}/SerieOfTournament/Tournaments/{link_season_num}")
-        self.links = self.parse_tournament_links(response.content)
-
-        self.place_fine = {
-            1: 20,
-            2: 15,
-            3: 10,
-            4: 0,
-            5: -10,
-            6: -15,
-            7: -20,
-            8: -25,
-            9: -30,
-            10: -35
-        }
-
-        self.RATING = {}
-        self.TOURS_COUNT = {}
-        self.DOPS = {}
-        self.POINTS = {}
-
-        self.calculate_rating_over_season()
-    
     @staticmethod
     def parse_tournament_links(html_content: bytes):
         '''Функция находит ссылки на сыгранные серии'''
-        soup = BeautifulSoup(html_content, "html.parser")
         links = [
-            item["href"]
-            for item in soup.find_all("a", class_="fw-bold")
-            if not re.compile(r"вне зачета", re.IGNORECASE).search(item.text)
+            href
+            for href, text in extract_links(html_content, "fw-bold")
+            if not OUT_OF_COMPETITION.search(text)
         ]
         links.reverse()
         if not links:
             raise RuntimeError("Tournaments weren't found")
         return links
     
-    def create_pd_of_tour_results(self, link, session):
-        ''' Функция создат датафрейм результатов серии (без внезачетных игроков) '''
-        tournament_link = f"{MAIN_URL}{link}"
-        soup = BeautifulSoup(session.get(tournament_link).content, "html.parser")
-        serya_num = self.links.index(link) + 1
-        result_table = soup.find("table", {"id": "TournResultsTable"})
-        if not result_table:
-            print(serya_num, tournament_link)
-            raise RuntimeError
-        results = []
-        for row in result_table.find('tbody').find_all('tr'):
-            elements = list(map(lambda x: x.text.strip(), row.find_all('td')))
-            place = int(elements[0])
-            nick = elements[1]
-            points = float(elements[2].replace(',', '.'))
-            dops = float(elements[3].replace(',', '.'))
-            wins = int(re.compile("[0-9]+").findall(elements[9])[0])
-            games = int(re.compile("[0-9]+").findall(elements[9])[1])
-            results.append((serya_num, nick, place, points, dops, wins, games))
-
-            self.RATING[nick] = self.RATING.get(nick, 100)
-            self.TOURS_COUNT[nick] = self.TOURS_COUNT.get(nick, 0) + 1
-            self.DOPS[nick] = self.DOPS.get(nick, 0) + dops
-            self.POINTS[nick] = self.POINTS.get(nick, 0) + points
-
-        tour_results = pd.DataFrame(results, columns=['Tour', 'Nick', 'Place', 'Points', 'Dops', 'Wins', 'Games'])\
-                         .sort_values(by='Points', ascending=False)
-        return tour_results
-    
-    def rating_formula(self, tour_results:pd.DataFrame):
-        results = tour_results.copy()
-        results['Rating_before'] = [self.RATING[results.loc[i, 'Nick']] for i in results.index]
-        results['place_fine'] = [self.place_fine[i] for i in results.Place]
-        results['points_effect'] = (results.Dops * 20 + results.Wins * 10)* 5/results.Games
-        results['Delta'] = results['place_fine'] + results['points_effect']
-        results['Rating'] = results['Rating_before'] + results['Delta']
-        return results
-    
-    def calculate_rating_over_season(self):
-        history = []
-        for link in self.links:
-            tour_results = self.create_pd_of_tour_results(link, session = requests.Session())
-            rating_after_tour = self.rating_formula(tour_results)
-            history.append(rating_after_tour)
-            for i, r in rating_after_tour.iterrows():
-                self.RATING[r.Nick] = r.Rating
-        self.history = pd.concat(history, ignore_index=True)
+    def apply_series(self, link, rows):
+        ''' Функция сворачивает результаты серии в рейтинг сезона '''
+        self.engine.apply_series(
+            self.links.index(link) + 1,
+            nicks=[row[1] for row in rows],
+            place=[row[0] for row in rows],
+            points=[row[2] for row in rows],
+            dops=[row[3] for row in rows],
+            wins=[row[4] for row in rows],
+            games=[row[5] for row in rows],
+        )
+
+    def apply_result(self, i, rows):
+        self.apply_series(self.links[i], rows)
 
     @property
     def finalysts(self):
-        result = []
-        for x in sorted(self.RATING, key=lambda x: -self.RATING[x]):
-            if self.TOURS_COUNT[x] >= 3:
-                result.append({
-                                "nickname": x,
-                                "rating": self.RATING[x],
-                                "series_count": self.TOURS_COUNT[x],
-                                'total_dops' : self.DOPS[x],
-                                'total_points' : self.POINTS[x],
-                                'avg_points' : self.POINTS[x] / self.TOURS_COUNT[x]
-                                })
+        result = [
+            {
+                "nickname": nick,
+                "rating": rating,
+                "series_count": series_count,
+                'total_dops' : dops,
+                'total_points' : points,
+                'avg_points' : points / series_count
+            }
+            for nick, rating, series_count, dops, points in self.engine.standings(min_series=FINAL_MIN_SERIES)
+        ]
         # result = result[:10]
+        import pandas as pd
+
         result = pd.DataFrame(result).sort_values('rating', ascending=False, ignore_index=True)
         return result
-    
-    @property
-    def current_rating(self):
-        result = []
-        for x in sorted(self.RATING, key=lambda x: -self.RATING[x]):
-            result.append({
-                            "nickname": x,
-                            "rating": ceil(self.RATING[x]),
-                            "series_count": self.TOURS_COUNT[x]
-                            })
-        return result
-    
-    def _repr_html_(self):
-        result = []
-        for x in self.RATING:
-            result.append({
-                            "nickname": x,
-                            "rating": self.RATING[x],
-                            "series_count": self.TOURS_COUNT[x],
-                            'total_dops' : self.DOPS[x],
-                            'total_points' : self.POINTS[x],
-                            'avg_points' : self.POINTS[x] / self.TOURS_COUNT[x]
-                            })
-        result = pd.DataFrame(result).sort_values('rating', ascending=False, ignore_index=True)
-        return result.head(20)._repr_html_()
-    
 
-def get_rating():
-    session = requests.Session()
-    response = get_series(session)
-    series_number = parse_season(response.content)
-    s = Season(session, series_number)
-    return s.current_rating
+
+@traced("entropy.get_rating")
+def get_rating(session: requests.Session = None):
+    session = session or default_transport()
+    return open_season(Season, session).current_rating
+
+
+def watch(game_days: Iterable[int], session: requests.Session = None, **kwargs) -> SeasonWatcher:
+    '''
+    Наблюдатель за текущим сезоном вместо повторных get_rating. game_days - дни недели серий
+    (0 - понедельник), kwargs - интервалы и часы игр SeasonWatcher.
+    '''
+    session = session or default_transport()
+    return SeasonWatcher(session, open_season(Season, session), game_days, **kwargs)
+
+
+def stream_rating(session: requests.Session = None) -> Iterator[Standings]:
+    '''Таблица текущего сезона после каждой свернутой серии, не дожидаясь загрузки всего сезона.'''
+    session = session or default_transport()
+    yield from open_season(Season, session, calculate=False).stream(session)
+
+
+RATING_SERVICE = RatingService(get_rating)
 
 
 def get_player_rating(player: str) -> dict[str, str]:
-    rating = get_rating()
-    for place, player_data in enumerate(rating, start=1):
-        if player_data['nickname'] == player:
-            data = player_data.copy()
-            data['place'] = place
-            return data
\ No newline at end of file
+    '''Рейтинг и место игрока из кэшированного рейтинга (ник без учета регистра).'''
+    return RATING_SERVICE.player(player)
+
+
+def get_players_rating(players: list[str]) -> dict[str, dict[str, str]]:
+    return RATING_SERVICE.players(players)
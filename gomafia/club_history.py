@@ -0,0 +1,255 @@
+'''
+Обход истории турниров всех игроков клуба на gomafia.pro для ачивок топ-10.
+Для каждого игрока запоминается самый новый уже виденный турнир, поэтому
+повторный обход скачивает только новые страницы истории.
+
+    python -m gomafia.club_history club_history.json --club /club/92 --year 2024
+'''
+import argparse
+import datetime
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional
+
+import requests
+from lxml import html
+
+MAIN_URL = "https://gomafia.pro"
+CLUB_URL = "/club/92"
+HISTORY_URL = "?tab=history"
+YEAR = 2024
+MAX_CLUB_PAGES = 10
+MAX_WORKERS = 8
+DATE_FORMAT = '%d.%m.%Y'
+HTML_PARSER = html.HTMLParser(encoding="utf-8")
+
+
+class HistoryRow(NamedTuple):
+    link: str
+    tournament: str
+    nominations: List[str]
+    date_start: str
+    date_end: str
+    place: int
+    gg: int
+
+
+@dataclass
+class ClubPlayer:
+    nick: str
+    link: str
+    gg: int
+    elo: int
+    achievements: Dict[str, dict] = field(default_factory=dict)
+
+    def __repr__(self):
+        return self.nick
+
+
+def parse_club_page(html_content: bytes) -> List[ClubPlayer]:
+    '''Функция разбирает страницу состава клуба: ник, ссылка, число игр, ELO.'''
+    tree = html.document_fromstring(html_content, parser=HTML_PARSER)
+    table = tree.find(".//table")
+    if table is None:
+        return []
+    players = []
+    for tr in table.iterfind("tbody/tr"):
+        data_row = tr.findall("td")
+        player = data_row[1].find(".//a")
+        players.append(ClubPlayer(
+            player.text_content(),
+            MAIN_URL + player.get("href"),
+            int(data_row[3].text_content()),
+            int(data_row[4].text_content()),
+        ))
+    return players
+
+
+def parse_history_row(tr) -> HistoryRow:
+    '''Парсит все нужные данные о результатах игрока на конкретном турнире за один проход по ячейкам'''
+    tds = tr.findall("td")
+    tournament = tds[1].find(".//a")
+    nominations = [
+        div.get("data-tooltip-html") for div in tds[1].iter("div") if div.get("data-tooltip-html")
+    ]
+    dates = tds[2].xpath('.//div[@class="undefined undefined"]')
+    return HistoryRow(
+        tournament.get("href"),
+        tournament.text_content(),
+        nominations,
+        dates[0].text_content(),
+        dates[1].text_content(),
+        int(tds[3].text_content()),
+        int(tds[4].text_content()),
+    )
+
+
+def parse_history_page(html_content: bytes) -> Optional[List[HistoryRow]]:
+    '''Функция разбирает страницу истории игрока, None - страниц больше нет.'''
+    tree = html.document_fromstring(html_content, parser=HTML_PARSER)
+    table = tree.find(".//table")
+    if table is None:
+        return None
+    return [parse_history_row(tr) for tr in table.iterfind("tbody/tr")]
+
+
+def club_members(session: requests.Session, club_url: str = CLUB_URL) -> List[ClubPlayer]:
+    '''Игроки клуба до первого игрока без игр (состав отсортирован по числу игр).'''
+    members = []
+    for page in range(1, MAX_CLUB_PAGES + 1):
+        players = parse_club_page(session.get(f"{MAIN_URL}{club_url}?page={page}").content)
+        for player in players:
+            if player.gg == 0:
+                return members
+            members.append(player)
+        if not players:
+            break
+    return members
+
+
+def crawl_player_history(session: requests.Session, link: str, year: int = YEAR,
+                         known_link: Optional[str] = None) -> List[HistoryRow]:
+    '''
+    Функция листает историю игрока от новых турниров к старым до турнира
+    прошлых лет или до уже виденного турнира known_link.
+    '''
+    rows = []
+    page = 0
+    while True:
+        page += 1
+        history = parse_history_page(session.get(f"{link}{HISTORY_URL}&page={page}").content)
+        if not history:
+            return rows
+        for row in history:
+            if row.link == known_link:
+                return rows
+            if datetime.datetime.strptime(row.date_start, DATE_FORMAT).year < year:
+                return rows
+            rows.append(row)
+
+
+def achievements(rows: List[HistoryRow]) -> Dict[str, dict]:
+    '''Ачивки по турнирам: место в топ-10, гран-гейм, номинации (отборы не учитываются).'''
+    result = {}
+    for row in rows:
+        current_achievments = {}
+        if row.place <= 10:
+            current_achievments['place'] = row.place
+        if row.gg > 0:
+            current_achievments['gg'] = row.gg
+        if row.nominations:
+            current_achievments['nominations'] = row.nominations
+        if current_achievments and 'отбор' not in row.tournament.lower():
+            current_achievments['date'] = datetime.datetime.strptime(row.date_start, DATE_FORMAT)
+            result[row.tournament] = current_achievments
+    return result
+
+
+class HistoryState():
+    '''
+    Сохраненные между запусками ачивки игроков и самый новый виденный турнир каждого игрока.
+
+    Parameters
+    ----------
+    path : str
+        JSON-файл состояния (None - состояние только в памяти)
+    '''
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.players: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.players = json.load(f)
+
+    def cursor(self, link: str, year: int) -> Optional[str]:
+        player = self.players.get(link)
+        return player["cursor"] if player and player.get("year") == year else None
+
+    def achievements(self, link: str, year: int) -> Dict[str, dict]:
+        player = self.players.get(link)
+        if not player or player.get("year") != year:
+            return {}
+        return {
+            tournament: dict(data, date=datetime.datetime.fromisoformat(data["date"]))
+            for tournament, data in player["achievements"].items()
+        }
+
+    def update(self, link: str, year: int, cursor: Optional[str], player_achievements: Dict[str, dict]):
+        with self._lock:
+            self.players[link] = {
+                "year": year,
+                "cursor": cursor,
+                "achievements": {
+                    tournament: dict(data, date=data["date"].isoformat())
+                    for tournament, data in player_achievements.items()
+                },
+            }
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.players, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+def crawl_club(session: requests.Session, club_url: str = CLUB_URL, year: int = YEAR,
+               state_path: Optional[str] = None, max_workers: int = MAX_WORKERS) -> Dict[int, ClubPlayer]:
+    '''Функция параллельно обходит истории игроков клуба и собирает их ачивки за год.'''
+    state = HistoryState(state_path)
+    members = club_members(session, club_url)
+
+    def crawl(player: ClubPlayer):
+        known_link = state.cursor(player.link, year)
+        rows = crawl_player_history(session, player.link, year, known_link)
+        player.achievements = state.achievements(player.link, year)
+        player.achievements.update(achievements(rows))
+        state.update(player.link, year, rows[0].link if rows else known_link, player.achievements)
+        return player
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        players = list(pool.map(crawl, members))
+    state.save()
+    return dict(enumerate(players, start=1))
+
+
+def club_achievements_frame(club_players: Dict[int, ClubPlayer]):
+    '''Места игроков клуба на турнирах в виде pandas.DataFrame, отсортированного по дате.'''
+    import pandas as pd
+
+    df_data = []
+    columns = ['nick', 'date', 'tour', 'place']
+    for pl in club_players.values():
+        for t, data in pl.achievements.items():
+            place = data.get('place', None)
+            if place:
+                df_data.append([pl.nick, data.get('date', None), t, place])
+    return pd.DataFrame(df_data, columns=columns).sort_values('date')
+
+
+def main():
+    from scraping.transport import default_transport
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("state_path", help="JSON с сохраненными историями игроков")
+    parser.add_argument("--club", default=CLUB_URL)
+    parser.add_argument("--year", type=int, default=YEAR)
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--csv", default=None, help="куда сохранить места игроков на турнирах")
+    args = parser.parse_args()
+    club_players = crawl_club(default_transport(), args.club, args.year, args.state_path, args.max_workers)
+    frame = club_achievements_frame(club_players)
+    if args.csv:
+        frame.to_csv(args.csv, encoding='cp1251', sep=';')
+    print(frame.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+'''
+Параллельный обход рейтинга ELO на gomafia.pro по регионам.
+
+    python -m gomafia.elo elo.csv --min-elo 2200
+'''
+import argparse
+import csv
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+import requests
+from lxml import html
+
+MAIN_URL = "https://gomafia.pro"
+SORT_BY_ELO = "/rating?sortTypeUsers=elo&sortOrderUsers=desc&regionUsers={}&pageUsers={}"
+REGIONS = ['central', 'chernozem_region', 'north', 'south', 'volga_region', 'siberia_and_ural']
+MIN_ELO = 2200
+PREFETCH = 2
+HTML_PARSER = html.HTMLParser(encoding="utf-8")
+
+
+class EloRow(NamedTuple):
+    region: str
+    link: str
+    nick: str
+    club: str
+    gg: int
+    elo: int
+
+
+@dataclass
+class RegionStats:
+    region: str
+    pages: int = 0
+    rows: int = 0
+    seconds: float = 0.0
+
+
+def parse_rating_page(html_content: bytes, region: str) -> List[EloRow]:
+    '''Функция разбирает страницу рейтинга: ссылка на игрока, ник, клуб, число игр и ELO.'''
+    tree = html.document_fromstring(html_content, parser=HTML_PARSER)
+    table = tree.find(".//table")
+    if table is None:
+        return []
+    rows = []
+    for tr in table.iterfind("tbody/tr"):
+        data_row = tr.findall("td")
+        player = data_row[1].find(".//a")
+        spans = data_row[1].findall(".//span")
+        rows.append(EloRow(
+            region,
+            MAIN_URL + player.get("href"),
+            player.text_content(),
+            spans[-1].text_content() if spans else "",
+            int(data_row[3].text_content()),
+            int(data_row[4].text_content()),
+        ))
+    return rows
+
+
+class CsvRowWriter():
+    '''
+    Потоковая запись строк в CSV по мере обхода: строки с уже встречавшимся
+    ключом (игрок попал на две страницы) пропускаются.
+    '''
+
+    def __init__(self, path: str, columns: Iterable[str], key: Callable[[tuple], object] = None):
+        self.path = path
+        self.columns = list(columns)
+        self.key = key
+        self.rows = 0
+        self.duplicates = 0
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+
+    def write(self, rows: Iterable[tuple]):
+        with self._lock:
+            for row in rows:
+                if self.key is not None:
+                    key = self.key(row)
+                    if key in self._seen:
+                        self.duplicates += 1
+                        continue
+                    self._seen.add(key)
+                self._writer.writerow(row)
+                self.rows += 1
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def frame(self):
+        '''Записанные строки в виде pandas.DataFrame.'''
+        import pandas as pd
+
+        return pd.read_csv(self.path)
+
+
+def crawl_region(session: requests.Session, pool: ThreadPoolExecutor, region: str,
+                 on_rows: Callable[[List[EloRow]], None], min_elo: int = MIN_ELO,
+                 prefetch: int = PREFETCH) -> RegionStats:
+    '''
+    Функция обходит страницы рейтинга региона, держа prefetch страниц в загрузке.
+    Обход останавливается на первой странице, где ELO опустилось ниже min_elo
+    (строки этой страницы тоже попадают в результат), или на пустой странице.
+    '''
+    stats = RegionStats(region)
+    start = time.perf_counter()
+
+    def fetch(page):
+        return session.get(MAIN_URL + SORT_BY_ELO.format(region, page)).content
+
+    pending = deque()
+    next_page = 1
+    for _ in range(max(1, prefetch)):
+        pending.append(pool.submit(fetch, next_page))
+        next_page += 1
+    while pending:
+        rows = parse_rating_page(pending.popleft().result(), region)
+        stats.pages += 1
+        stats.rows += len(rows)
+        if rows:
+            on_rows(rows)
+        if not rows or min(row.elo for row in rows) < min_elo:
+            break
+        pending.append(pool.submit(fetch, next_page))
+        next_page += 1
+    for future in pending:
+        future.cancel()
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def crawl_elo(session: requests.Session, path: str, regions: Optional[List[str]] = None, min_elo: int = MIN_ELO,
+              prefetch: int = PREFETCH) -> List[RegionStats]:
+    '''Функция параллельно обходит регионы и пишет игроков (без повторов) в CSV path.'''
+    regions = regions or REGIONS
+    with CsvRowWriter(path, EloRow._fields, key=lambda row: row.link) as writer, \
+            ThreadPoolExecutor(max_workers=len(regions) * max(1, prefetch)) as pages_pool, \
+            ThreadPoolExecutor(max_workers=len(regions)) as regions_pool:
+        futures = [
+            regions_pool.submit(crawl_region, session, pages_pool, region, writer.write, min_elo, prefetch)
+            for region in regions
+        ]
+        return [future.result() for future in futures]
+
+
+def main():
+    from scraping.transport import default_transport
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV с результатом")
+    parser.add_argument("--regions", nargs="+", choices=REGIONS, default=REGIONS)
+    parser.add_argument("--min-elo", type=int, default=MIN_ELO)
+    parser.add_argument("--prefetch", type=int, default=PREFETCH)
+    args = parser.parse_args()
+    for stats in crawl_elo(default_transport(), args.path, args.regions, args.min_elo, args.prefetch):
+        print(f"{stats.region}: {stats.pages} pages, {stats.rows} rows, {stats.seconds:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
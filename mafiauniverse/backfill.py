@@ -0,0 +1,333 @@
+'''
+Выгрузка всех прошлых сезонов серий турниров в локальную базу sqlite
+и пересчет рейтинга любого сезона по локальным данным.
+
+    python -m mafiauniverse.backfill crawl --names Энтропия Магистрейтик --first-year 2020
+    python -m mafiauniverse.backfill seasons
+    python -m mafiauniverse.backfill rating 1234 --formula magistraytik magistraytik_old
+'''
+import argparse
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from mafiauniverse.cache import CACHE_DIR
+from mafiauniverse.engine import RatingEngine
+from mafiauniverse.fetch import MAX_WORKERS, fetch_pages
+from mafiauniverse.scoring import Scoreboard
+from mafiauniverse.search import PAGE_SIZE, search_series
+from mafiauniverse.tables import ResultRow, extract_links, extract_results
+
+MAIN_URL = "https://mafiauniverse.org"
+NUMBER = re.compile(r"[0-9]+")
+FIRST_YEAR = 2018
+MAX_SEARCH_PAGES = 20
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS seasons (
+    season_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    title TEXT NOT NULL,
+    year INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS series (
+    season_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    link TEXT NOT NULL,
+    link_title TEXT NOT NULL,
+    page_title TEXT,
+    PRIMARY KEY (season_id, position)
+);
+CREATE TABLE IF NOT EXISTS results (
+    season_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    place INTEGER NOT NULL,
+    nick TEXT NOT NULL,
+    points REAL NOT NULL,
+    dops REAL NOT NULL,
+    wins INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (season_id, position, row)
+);
+CREATE INDEX IF NOT EXISTS series_link ON series (link);
+CREATE INDEX IF NOT EXISTS results_nick ON results (nick);
+CREATE INDEX IF NOT EXISTS seasons_name ON seasons (name, year);
+'''
+
+
+class HistoryStore():
+    '''
+    Локальная база результатов: сезоны, серии сезонов и строки результатов
+    (игрок в серии) с индексами по сезону и нику.
+
+    Parameters
+    ----------
+    path : str
+        Путь к файлу sqlite
+    '''
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(CACHE_DIR, "history.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def save_season(self, season_id: int, name: str, title: str, year: int):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO seasons (season_id, name, title, year) VALUES (?, ?, ?, ?)",
+                (season_id, name, title, year),
+            )
+
+    def save_series(self, season_id: int, position: int, link: str, link_title: str,
+                    page_title: Optional[str], rows: List[ResultRow]):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO series (season_id, position, link, link_title, page_title) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (season_id, position, link, link_title, page_title),
+            )
+            self._connection.execute(
+                "DELETE FROM results WHERE season_id = ? AND position = ?", (season_id, position)
+            )
+            self._connection.executemany(
+                "INSERT INTO results (season_id, position, row, place, nick, points, dops, wins, games) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(season_id, position, i, *row) for i, row in enumerate(rows)],
+            )
+
+    def known_links(self) -> set:
+        with self._lock:
+            return {link for link, in self._connection.execute("SELECT link FROM series")}
+
+    def seasons(self, name: Optional[str] = None) -> List[Tuple[int, str, str, int]]:
+        query = "SELECT season_id, name, title, year FROM seasons"
+        params = ()
+        if name is not None:
+            query += " WHERE name = ?"
+            params = (name,)
+        with self._lock:
+            return self._connection.execute(query + " ORDER BY year, season_id", params).fetchall()
+
+    def season_series(self, season_id: int) -> List[Tuple[int, str, str, List[ResultRow]]]:
+        '''Серии сезона в порядке игры: позиция, ссылка, текст ссылки, строки результатов.'''
+        with self._lock:
+            series = self._connection.execute(
+                "SELECT position, link, link_title FROM series WHERE season_id = ? ORDER BY position",
+                (season_id,),
+            ).fetchall()
+            results = self._connection.execute(
+                "SELECT position, place, nick, points, dops, wins, games FROM results "
+                "WHERE season_id = ? ORDER BY position, row",
+                (season_id,),
+            ).fetchall()
+        rows = {}
+        for position, *row in results:
+            rows.setdefault(position, []).append(ResultRow(*row))
+        return [(position, link, link_title, rows.get(position, [])) for position, link, link_title in series]
+
+    def player_results(self, nick: str) -> List[tuple]:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT seasons.name, seasons.title, series.link_title, place, points, dops, wins, games "
+                "FROM results JOIN series USING (season_id, position) JOIN seasons USING (season_id) "
+                "WHERE nick = ? ORDER BY seasons.year, season_id, position",
+                (nick,),
+            ).fetchall()
+
+
+def parse_search_results(html_content: bytes, name: str) -> List[Tuple[int, str]]:
+    '''Функция находит в результатах поиска сезоны с названием name: номер в ссылке и название.'''
+    found = []
+    for href, title in extract_links(html_content):
+        title = title.strip()
+        numbers = NUMBER.findall(href or "")
+        if numbers and name.lower() in title.lower():
+            found.append((int(numbers[0]), title))
+    return found
+
+
+def parse_season_links(html_content: bytes) -> List[Tuple[str, str]]:
+    '''Функция находит все серии сезона от первой к последней: ссылка и текст ссылки.'''
+    links = [(href, title.strip()) for href, title in extract_links(html_content, "fw-bold")]
+    links.reverse()
+    return links
+
+
+def find_seasons(session: requests.Session, name: str, year: int,
+                 main_url: str = MAIN_URL) -> List[Tuple[int, str]]:
+    '''Функция постранично проходит поиск серий турниров за год.'''
+    seasons = {}
+    for page in range(1, MAX_SEARCH_PAGES + 1):
+        response = search_series(session, main_url, name, year=year, page=page)
+        found = parse_search_results(response.content, name)
+        new = [(season_id, title) for season_id, title in found if season_id not in seasons]
+        seasons.update(new)
+        if not new or len(found) < PAGE_SIZE:
+            break
+    return list(seasons.items())
+
+
+def backfill(session: requests.Session, store: HistoryStore, names: Iterable[str], first_year: int = FIRST_YEAR,
+             last_year: Optional[int] = None, max_workers: int = MAX_WORKERS, main_url: str = MAIN_URL) -> int:
+    '''
+    Функция выгружает в базу все сезоны с данными названиями за годы first_year..last_year.
+    Уже выгруженные серии не скачиваются, кроме последней серии идущих сезонов.
+    Возвращает число скачанных серий.
+    '''
+    last_year = last_year or datetime.now().year
+    jobs = [(name, year) for name in names for year in range(first_year, last_year + 1)]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as pool:
+        found = pool.map(lambda job: (job, find_seasons(session, job[0], job[1], main_url)), jobs)
+        seasons = {}
+        for (name, year), items in found:
+            for season_id, title in items:
+                seasons.setdefault(season_id, (name, title, year))
+
+    return store_seasons(session, store, seasons, max_workers, main_url)
+
+
+def parse_results_page(html_content: Optional[bytes]) -> Optional[Tuple[str, List[ResultRow]]]:
+    '''
+    Функция разбирает страницу серии: заголовок и строки результатов (None - страницы или таблицы нет).
+    Серии без колонки побед/игр сохраняются с нулями: их не примет только формула Энтропии.
+    '''
+    if html_content is None:
+        return None
+    try:
+        return extract_results(html_content, games=False)
+    except RuntimeError:
+        return None
+
+
+def store_seasons(session: requests.Session, store: HistoryStore, seasons: Dict[int, Tuple[str, str, int]],
+                  max_workers: int = MAX_WORKERS, main_url: str = MAIN_URL, pool: Optional[Executor] = None) -> int:
+    '''
+    Функция выгружает в базу сезоны (номер -> (название серии, название сезона, год)).
+    Уже выгруженные серии не скачиваются, кроме последней серии идущих сезонов
+    (текущего года или с новыми сериями).
+    Страницы разбираются в pool (например, в пуле процессов), без него - в текущем потоке.
+    Возвращает число скачанных серий.
+    '''
+    season_ids = list(seasons)
+    pages = fetch_pages(
+        session, [f"{main_url}/SerieOfTournament/Tournaments/{season_id}" for season_id in season_ids], max_workers,
+        skip_errors=True,
+    )
+    known = store.known_links()
+    todo = []
+    for season_id, html_content in zip(season_ids, pages):
+        if html_content is None:
+            continue
+        name, title, year = seasons[season_id]
+        store.save_season(season_id, name, title, year)
+        links = parse_season_links(html_content)
+        # сезон идет, если это сезон текущего года или у него появились новые серии
+        # (сезон прошлого года может продолжаться после Нового года)
+        running = year == datetime.now().year or any(link not in known for link, _ in links)
+        for position, (link, link_title) in enumerate(links):
+            still_open = running and position == len(links) - 1
+            if link not in known or still_open:
+                todo.append((season_id, position, link, link_title))
+
+    # серия, попавшая в несколько сезонов, скачивается и разбирается один раз
+    unique = list(dict.fromkeys(link for _, _, link, _ in todo))
+    pages = fetch_pages(session, [f"{main_url}{link}" for link in unique], max_workers, skip_errors=True)
+    if pool is not None:
+        parsed = dict(zip(unique, pool.map(parse_results_page, pages, chunksize=16)))
+    else:
+        parsed = dict(zip(unique, map(parse_results_page, pages)))
+    downloaded = 0
+    for season_id, position, link, link_title in todo:
+        result = parsed[link]
+        if result is None:
+            continue
+        page_title, rows = result
+        if rows:
+            store.save_series(season_id, position, link, link_title, page_title, rows)
+            downloaded += 1
+    return downloaded
+
+
+def season_ratings(store: HistoryStore, season_id: int, formulas: Dict[str, Tuple[Callable, Callable[[str], bool]]],
+                   exclude: Iterable[str] = ()) -> Scoreboard:
+    '''
+    Функция пересчитывает рейтинг сезона по локальной базе сразу по нескольким формулам
+    (имя -> (формула, фильтр серий по названию или None)), номер серии - ее позиция в сезоне.
+    '''
+    board = Scoreboard({name: formula for name, (formula, _) in formulas.items()})
+    for position, _, link_title, rows in store.season_series(season_id):
+        names = [name for name, (_, link_filter) in formulas.items() if link_filter is None or link_filter(link_title)]
+        if names:
+            board.apply_rows(position + 1, rows, exclude, names)
+    return board
+
+
+def season_rating(store: HistoryStore, season_id: int, formula, link_filter: Callable[[str], bool] = None,
+                  exclude: Iterable[str] = ()) -> RatingEngine:
+    '''Функция пересчитывает рейтинг сезона по одной формуле.'''
+    return season_ratings(store, season_id, {"rating": (formula, link_filter)}, exclude)["rating"]
+
+
+def formulas():
+    '''Формулы рейтинга по имени и фильтры серий, которые идут в зачет.'''
+    from entropy.rating import OUT_OF_COMPETITION, PLACE_FINE
+    from magistraytik import rating_old_scoring
+    from magistraytik.rating_new_scoring import TOP_DISTRIBUTION, VALID_SERIES
+    from mafiauniverse.engine import EntropyFormula, MagistraytikFormula, OldMagistraytikFormula
+
+    return {
+        "entropy": (EntropyFormula(PLACE_FINE), lambda title: not OUT_OF_COMPETITION.search(title)),
+        "magistraytik": (MagistraytikFormula(TOP_DISTRIBUTION), lambda title: bool(VALID_SERIES.search(title))),
+        "magistraytik_old": (
+            OldMagistraytikFormula(rating_old_scoring.TOP_DISTRIBUTION, rating_old_scoring.DOPS_SHARE),
+            lambda title: bool(rating_old_scoring.VALID_SERIES.search(title)),
+        ),
+    }
+
+
+def main():
+    from scraping.transport import default_transport
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="файл базы sqlite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    crawl_parser = commands.add_parser("crawl", help="выгрузить сезоны в базу")
+    crawl_parser.add_argument("--names", nargs="+", default=["Энтропия", "Магистрейтик"])
+    crawl_parser.add_argument("--first-year", type=int, default=FIRST_YEAR)
+    crawl_parser.add_argument("--last-year", type=int, default=None)
+    crawl_parser.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    commands.add_parser("seasons", help="список выгруженных сезонов")
+    rating_parser = commands.add_parser("rating", help="рейтинг сезона по базе")
+    rating_parser.add_argument("season_id", type=int)
+    rating_parser.add_argument("--formula", nargs="+", choices=["entropy", "magistraytik", "magistraytik_old"],
+                               required=True, help="несколько формул считаются за один проход")
+    rating_parser.add_argument("--exclude", nargs="*", default=[])
+    rating_parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    if args.command == "crawl":
+        downloaded = backfill(default_transport(), store, args.names, args.first_year, args.last_year, args.max_workers)
+        print(f"downloaded {downloaded} series, seasons in store: {len(store.seasons())}")
+    elif args.command == "seasons":
+        for season_id, name, title, year in store.seasons():
+            print(f"{season_id}\t{year}\t{name}\t{title}")
+    else:
+        available = formulas()
+        board = season_ratings(store, args.season_id, {name: available[name] for name in args.formula}, args.exclude)
+        for name, standings in board.standings().items():
+            print(f"# {name}")
+            for place, (nick, rating, series_count, _, _) in enumerate(standings[:args.top], start=1):
+                print(f"{place}\t{nick}\t{rating:.1f}\t{series_count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+'''
+Рейтинги сразу нескольких сезонов и серий турниров (сравнение сезонов Магистрейтика,
+ретроспектива Энтропии) одной таблицей.
+
+    python -m mafiauniverse.batch Магистрейтик:21:magistraytik Магистрейтик:22:magistraytik Энтропия:11:entropy
+
+Страницы скачиваются один раз в общую базу HistoryStore: сезон, нужный нескольким задачам,
+и уже выгруженные серии повторно не качаются. Разбор страниц и свертка сезонов идут
+в пуле процессов, формулы одного сезона сворачиваются за один проход.
+'''
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import requests
+
+from mafiauniverse.backfill import (
+    FIRST_YEAR, MAIN_URL, HistoryStore, find_seasons, formulas, season_ratings, store_seasons,
+)
+from mafiauniverse.fetch import MAX_WORKERS
+from mafiauniverse.profiling import span
+
+
+class Job(NamedTuple):
+    name: str
+    season_id: int
+    formula: str
+
+
+def score_season_job(path: str, season_id: int, names: Tuple[str, ...],
+                     exclude: Tuple[str, ...]) -> Dict[str, list]:
+    '''Функция для процесса пула: таблицы сезона по формулам names из базы path.'''
+    available = formulas()
+    board = season_ratings(HistoryStore(path), season_id, {name: available[name] for name in names}, exclude)
+    return board.standings()
+
+
+def find_titles(session: requests.Session, jobs: Iterable[Job], main_url: str = MAIN_URL,
+                first_year: int = FIRST_YEAR) -> Dict[int, Tuple[str, str, int]]:
+    '''
+    Функция находит поиском на сайте название и год сезонов задач (номер -> (серия, название, год)),
+    просматривая годы от текущего к first_year. Сезон, которого нет в поиске, - ошибка.
+    '''
+    wanted: Dict[str, set] = {}
+    for job in jobs:
+        wanted.setdefault(job.name, set()).add(job.season_id)
+    found = {}
+    for name, season_ids in wanted.items():
+        for year in range(datetime.now().year, first_year - 1, -1):
+            for season_id, title in find_seasons(session, name, year, main_url):
+                if season_id in season_ids:
+                    found.setdefault(season_id, (name, title, year))
+            if season_ids <= found.keys():
+                break
+        else:
+            missing = sorted(season_ids - found.keys())
+            raise RuntimeError(f"Seasons {missing} of {name} weren't found in search")
+    return found
+
+
+def run_batch(jobs: Iterable[Job], session: Optional[requests.Session] = None, store: Optional[HistoryStore] = None,
+              exclude: Iterable[str] = (), processes: Optional[int] = None, max_workers: int = MAX_WORKERS,
+              main_url: str = MAIN_URL) -> List[dict]:
+    '''
+    Функция считает задачи (серия турниров, номер сезона в ссылке, имя формулы из backfill.formulas)
+    и возвращает одну таблицу: строки всех задач с местом игрока в своей задаче.
+    Без session считает только по уже выгруженной базе. processes - размер пула (None - по числу ядер).
+    '''
+    jobs = list(jobs)
+    available = formulas()
+    for job in jobs:
+        if job.formula not in available:
+            raise ValueError(f"Unknown formula: {job.formula}")
+    store = store or HistoryStore()
+    exclude = tuple(exclude)
+    by_season: Dict[int, List[str]] = {}
+    for job in jobs:
+        names = by_season.setdefault(job.season_id, [])
+        if job.formula not in names:
+            names.append(job.formula)
+
+    with ProcessPoolExecutor(processes) as pool:
+        if session is not None:
+            known = {season_id: (name, title, year) for season_id, name, title, year in store.seasons()}
+            # название и год нового для базы сезона берутся из поиска, как при backfill
+            known.update(find_titles(session, [job for job in jobs if job.season_id not in known], main_url))
+            # у сезона в базе перечитывается только страница сезона: скачиваются серии, которых
+            # в базе еще нет, так что законченный сезон обходится одним запросом
+            todo = {job.season_id: known[job.season_id] for job in jobs}
+            store_seasons(session, store, todo, max_workers, main_url, pool)
+        with span("fold", seasons=len(by_season), jobs=len(jobs)):
+            futures = {
+                season_id: pool.submit(score_season_job, store.path, season_id, tuple(names), exclude)
+                for season_id, names in by_season.items()
+            }
+            standings = {season_id: future.result() for season_id, future in futures.items()}
+
+    table = []
+    for job in jobs:
+        for place, (nick, rating, series_count, dops, points) in enumerate(
+                standings[job.season_id][job.formula], start=1):
+            table.append({
+                "series": job.name,
+                "season_id": job.season_id,
+                "formula": job.formula,
+                "place": place,
+                "nickname": nick,
+                "rating": rating,
+                "series_count": series_count,
+                "total_dops": dops,
+                "total_points": points,
+            })
+    return table
+
+
+def parse_job(text: str) -> Job:
+    name, season_id, formula = text.rsplit(":", 2)
+    return Job(name, int(season_id), formula)
+
+
+def main():
+    from scraping.transport import default_transport
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", nargs="+", type=parse_job, help="серия:номер сезона:формула")
+    parser.add_argument("--db", default=None, help="файл базы sqlite")
+    parser.add_argument("--exclude", nargs="*", default=[])
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--offline", action="store_true", help="считать только по уже выгруженной базе")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    session = None if args.offline else default_transport()
+    table = run_batch(args.jobs, session, HistoryStore(args.db), args.exclude, args.processes)
+    for row in table:
+        if row["place"] <= args.top:
+            print(f"{row['series']}\t{row['season_id']}\t{row['formula']}\t{row['place']}\t"
+                  f"{row['nickname']}\t{row['rating']:.1f}\t{row['series_count']}")
+
+
+if __name__ == "__main__":
+    main()
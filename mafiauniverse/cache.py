@@ -0,0 +1,206 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import requests
+
+from mafiauniverse.fetch import MAX_WORKERS, fetch_page, fetch_pages, iter_pages
+from mafiauniverse.profiling import span
+
+CACHE_DIR = os.environ.get(
+    "MAFIA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "mafia_club_incognito")
+)
+MAX_ENTRIES = 5000
+# сколько обращений к сериям копится в памяти перед записью времени обращения в базу
+TOUCH_BATCH = 256
+
+
+class TournamentCache():
+    '''
+    Дисковый кэш распарсенных результатов сыгранных серий.
+
+    Parameters
+    ----------
+    namespace : str
+        Пространство имен (у каждого рейтинга свой формат строк)
+    path : str
+        Путь к файлу sqlite
+    max_entries : int
+        Максимальное число серий в пространстве имен, самые давно использованные вытесняются
+    '''
+
+    def __init__(self, namespace: str, path: Optional[str] = None, max_entries: int = MAX_ENTRIES):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.path = path or os.path.join(CACHE_DIR, "tournaments.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS tournaments ("
+            "namespace TEXT NOT NULL, link TEXT NOT NULL, rows TEXT NOT NULL, accessed REAL NOT NULL, "
+            "PRIMARY KEY (namespace, link))"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS tournaments_namespace_accessed ON tournaments (namespace, accessed)"
+        )
+        self._connection.commit()
+        self._touched: Dict[str, float] = {}
+
+    def _flush_touched(self):
+        '''Записывает накопленные времена обращений (вызывается под self._lock, без commit).'''
+        if self._touched:
+            self._connection.executemany(
+                "UPDATE tournaments SET accessed = ? WHERE namespace = ? AND link = ?",
+                [(accessed, self.namespace, link) for link, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def flush(self):
+        with self._lock:
+            self._flush_touched()
+            self._connection.commit()
+
+    def get(self, link: str) -> Optional[Any]:
+        '''Результаты серии или None. Время обращения пишется в базу пачками, а не при каждом чтении.'''
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT rows FROM tournaments WHERE namespace = ? AND link = ?", (self.namespace, link)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[link] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+                self._connection.commit()
+        return json.loads(row[0])
+
+    def put(self, link: str, rows: Any):
+        with self._lock:
+            self._touched.pop(link, None)
+            self._flush_touched()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tournaments (namespace, link, rows, accessed) VALUES (?, ?, ?, ?)",
+                (self.namespace, link, json.dumps(rows, ensure_ascii=False), time.time()),
+            )
+            # у каждого пространства имен свой предел: заполнение одного не вытесняет другие
+            self._connection.execute(
+                "DELETE FROM tournaments WHERE rowid IN ("
+                "SELECT rowid FROM tournaments WHERE namespace = ? ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.max_entries),
+            )
+            self._connection.commit()
+
+    def invalidate(self, link: Optional[str] = None):
+        '''Удаляет серию из кэша (без ссылки - все серии пространства имен).'''
+        with self._lock:
+            if link is None:
+                self._touched.clear()
+            else:
+                self._touched.pop(link, None)
+            if link is None:
+                self._connection.execute("DELETE FROM tournaments WHERE namespace = ?", (self.namespace,))
+            else:
+                self._connection.execute(
+                    "DELETE FROM tournaments WHERE namespace = ? AND link = ?", (self.namespace, link)
+                )
+            self._connection.commit()
+
+    def __contains__(self, link: str) -> bool:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM tournaments WHERE namespace = ? AND link = ?", (self.namespace, link)
+            ).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM tournaments WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+
+def drop_open(cache: TournamentCache, links: List[str]):
+    '''
+    Удаляет из кэша серии, которые еще могут играться: такая серия могла попасть в кэш недоигранной
+    (например, первый стол серии, пока играется второй), и после завершения она должна скачаться заново.
+    '''
+    for link in links:
+        if link in cache:
+            cache.invalidate(link)
+
+
+def load_series(session: requests.Session, main_url: str, links: List[str], parse: Callable[[bytes], Any],
+                cache: Optional[TournamentCache] = None, max_workers: int = MAX_WORKERS,
+                open_results: Optional[List[Any]] = None, open_links: int = 1) -> List[Any]:
+    '''
+    Функция возвращает распарсенные результаты серий в порядке ссылок.
+    Сыгранные серии берутся из кэша, в сеть идут только отсутствующие в нем серии
+    и последние open_links серий (возможно, еще не завершенных), которые в кэш не попадают.
+    open_results - уже скачанные и разобранные вызывающим результаты этих последних серий.
+    '''
+    closed = max(len(links) - open_links, 0)
+    results = [None] * len(links)
+    missing = []
+    with span("cache", series=len(links)):
+        if cache is not None:
+            drop_open(cache, links[closed:])
+        for i, link in enumerate(links):
+            cached = cache.get(link) if cache is not None and i < closed else None
+            if cached is None:
+                missing.append(i)
+            else:
+                results[i] = cached
+    if open_results is not None:
+        missing = [i for i in missing if i < closed]
+        results[closed:] = open_results
+    pages = fetch_pages(session, [f"{main_url}{links[i]}" for i in missing], max_workers)
+    with span("parse", pages=len(missing)):
+        for i, html_content in zip(missing, pages):
+            try:
+                results[i] = parse(html_content)
+            except RuntimeError as err:
+                raise RuntimeError(f"{main_url}{links[i]}: {err}") from err
+            if cache is not None and i < closed:
+                cache.put(links[i], results[i])
+    if cache is not None:
+        cache.flush()
+    return results
+
+
+def iter_series(session: requests.Session, main_url: str, links: List[str], parse: Callable[[bytes], Any],
+                cache: Optional[TournamentCache] = None, max_workers: int = MAX_WORKERS,
+                open_links: int = 1) -> Iterator[Any]:
+    '''
+    Потоковый вариант load_series: результаты серий отдаются по одной в порядке ссылок,
+    пока вызывающий сворачивает серию, следующие страницы уже скачиваются.
+    В памяти одновременно не больше max_workers скачанных страниц.
+    '''
+    closed = max(len(links) - open_links, 0)
+    if cache is not None:
+        drop_open(cache, links[closed:])
+    missing = [i for i, link in enumerate(links) if cache is None or i >= closed or link not in cache]
+    pages = iter_pages(session, [f"{main_url}{links[i]}" for i in missing], max_workers)
+    missing = set(missing)
+    for i, link in enumerate(links):
+        if i in missing:
+            html_content = next(pages)
+        else:
+            cached = cache.get(link)
+            if cached is not None:
+                yield cached
+                continue
+            # серию вытеснили из кэша после проверки
+            html_content = fetch_page(session, f"{main_url}{link}")
+        with span("parse", pages=1):
+            try:
+                result = parse(html_content)
+            except RuntimeError as err:
+                raise RuntimeError(f"{main_url}{link}: {err}") from err
+        if cache is not None and i < closed:
+            cache.put(link, result)
+        yield result
+    if cache is not None:
+        cache.flush()
@@ -0,0 +1,392 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from mafiauniverse.history import RatingHistory
+from mafiauniverse.ranking import RankIndex
+
+INITIAL_RATING = 100.0
+FINAL_MIN_SERIES = 3
+
+
+class SeriesArrays(NamedTuple):
+    '''
+    Результаты одной серии в виде массивов, строки в порядке таблицы результатов.
+    Формулы считают по последней оси, поэтому принимают и пачку сценариев (сценарий x строка).
+    '''
+    tour: float
+    ids: np.ndarray
+    place: np.ndarray
+    points: np.ndarray
+    dops: np.ndarray
+    wins: np.ndarray
+    games: np.ndarray
+
+
+class EntropyFormula():
+    '''
+    Рейтинг Энтропии: штраф/бонус за место плюс вклад допов и побед на игру.
+
+    Parameters
+    ----------
+    place_fine : dict[int, float]
+        Изменение рейтинга за место в серии
+    '''
+    series_columns = ['Tour', 'Nick', 'Place', 'Points', 'Dops', 'Wins', 'Games']
+
+    def __init__(self, place_fine: Dict[int, float]):
+        self.place_fine = place_fine
+        self._fines = np.zeros(max(place_fine) + 1)
+        self._fines[list(place_fine)] = list(place_fine.values())
+
+    def __call__(self, before: np.ndarray, series: SeriesArrays) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        if not np.all(series.games):
+            # строки без колонки побед/игр (например, из базы backfill) Энтропией не считаются
+            raise RuntimeError("Entropy rating needs wins/games of every row")
+        place_fine = self._fines[series.place]
+        points_effect = (series.dops * 20 + series.wins * 10) * 5 / series.games
+        return place_fine + points_effect, {'place_fine': place_fine, 'points_effect': points_effect}
+
+
+class MagistraytikFormula():
+    '''
+    Рейтинг Магистрейтика: каждый игрок вносит 10% рейтинга в банк (плюс 25),
+    банк делится между первыми местами по top_distribution.
+
+    Parameters
+    ----------
+    top_distribution : dict[int, float]
+        Доля банка за место в таблице результатов
+    '''
+    series_columns = ['Tour', 'Nick', 'Place', 'Points', 'Dops']
+
+    def __init__(self, top_distribution: Dict[int, float]):
+        self.top_distribution = top_distribution
+        self._shares = np.array([top_distribution.get(i + 1, 0) for i in range(max(top_distribution))])
+
+    def __call__(self, before: np.ndarray, series: SeriesArrays) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        bank = before.sum(axis=-1, keepdims=True) * 0.1 + 25
+        shares = np.zeros(before.shape[-1])
+        top = min(before.shape[-1], len(self._shares))
+        shares[:top] = self._shares[:top]
+        return -before * 0.1 + shares * bank, {}
+
+
+class OldMagistraytikFormula():
+    '''
+    Рейтинг Магистрейтика по старым правилам: банк (10% рейтинга плюс 25) делится
+    между первыми местами по top_distribution, а если в серии были положительные допы -
+    доля dops_share банка делится пропорционально положительным допам.
+
+    Parameters
+    ----------
+    top_distribution : dict[int, float]
+        Доля банка за место в таблице результатов
+    dops_share : float
+        Доля банка, которая делится по допам
+    '''
+    series_columns = ['Tour', 'Nick', 'Place', 'Points', 'Dops']
+
+    def __init__(self, top_distribution: Dict[int, float], dops_share: float = 0.5):
+        self.top_distribution = top_distribution
+        self.dops_share = dops_share
+        self._shares = np.array([top_distribution.get(i + 1, 0) for i in range(max(top_distribution))])
+
+    def __call__(self, before: np.ndarray, series: SeriesArrays) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        bank = before.sum(axis=-1, keepdims=True) * 0.1 + 25
+        shares = np.zeros(before.shape[-1])
+        top = min(before.shape[-1], len(self._shares))
+        shares[:top] = self._shares[:top]
+        dops = np.clip(series.dops, 0, None)
+        dops_sum = dops.sum(axis=-1, keepdims=True)
+        by_dops = shares * (1 - self.dops_share) + dops / np.where(dops_sum > 0, dops_sum, 1) * self.dops_share
+        shares = np.where(dops_sum > 0, by_dops, shares)
+        return -before * 0.1 + shares * bank, {}
+
+
+class Standings(NamedTuple):
+    '''
+    Неизменяемая таблица рейтинга после series свернутых серий: массивы скопированы
+    и закрыты для записи, поэтому свертка следующих серий ее не меняет.
+    Порядок строк считается только при обращении к таблице.
+    '''
+    series: int
+    nicknames: Tuple[str, ...]
+    rating: np.ndarray
+    tours_count: np.ndarray
+    dops: np.ndarray
+    points: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.nicknames)
+
+    def order(self, min_series: int = 0) -> np.ndarray:
+        '''Номера игроков по убыванию рейтинга (при равенстве - в порядке появления).'''
+        order = np.lexsort((np.arange(len(self.rating)), -self.rating))
+        if min_series > 1:
+            order = order[self.tours_count[order] >= min_series]
+        return order
+
+    def top(self, k: int, min_series: int = 0) -> List[Tuple[str, float, int, float, float]]:
+        return self._rows(self.order(min_series)[:k])
+
+    def standings(self, min_series: int = 0) -> List[Tuple[str, float, int, float, float]]:
+        '''Строки таблицы по убыванию рейтинга: ник, рейтинг, число серий, сумма допов, сумма баллов.'''
+        return self._rows(self.order(min_series))
+
+    def _rows(self, order: np.ndarray) -> List[Tuple[str, float, int, float, float]]:
+        return list(zip(
+            [self.nicknames[i] for i in order],
+            self.rating[order].tolist(),
+            self.tours_count[order].tolist(),
+            self.dops[order].tolist(),
+            self.points[order].tolist(),
+        ))
+
+
+class RatingEngine():
+    '''
+    Свертка рейтинга по сериям на массивах NumPy: ники один раз отображаются
+    в целые номера игроков, рейтинг, число серий, допы и баллы хранятся в массивах.
+    Игроки нумеруются в порядке появления в сезоне: при равном рейтинге выше тот, кто появился раньше.
+
+    Parameters
+    ----------
+    formula
+        Формула изменения рейтинга за серию
+    initial_rating : float
+        Рейтинг игрока до первой серии
+    registry : PlayerRegistry
+        Реестр игроков: ники сводятся к одному написанию без учета регистра и с псевдонимами
+        (None - ники сравниваются как есть)
+    '''
+
+    def __init__(self, formula, initial_rating: float = INITIAL_RATING, registry=None):
+        self.formula = formula
+        self.initial_rating = initial_rating
+        self.registry = registry
+        self.ids: Dict[str, int] = {}
+        # номер игрока в сезоне по номеру реестра (-1 - еще не играл в сезоне)
+        self.registry_ids = np.zeros(0, dtype=np.int64)
+        self.nicknames: List[str] = []
+        self.rating = np.zeros(0)
+        self.tours_count = np.zeros(0, dtype=np.int64)
+        self.dops = np.zeros(0)
+        self.points = np.zeros(0)
+        self.log = RatingHistory()
+        self.ranking = RankIndex()
+        self.finalists = RankIndex()
+
+    def __len__(self) -> int:
+        return len(self.nicknames)
+
+    def __getstate__(self):
+        # реестр общий для процесса и живет отдельно, в снимок сезона он не попадает, как и номера реестра:
+        # другой процесс мог пронумеровать игроков иначе, при подключении реестра они строятся заново по никам
+        state = dict(self.__dict__)
+        state['registry'] = None
+        state['registry_ids'] = np.zeros(0, dtype=np.int64)
+        return state
+
+    def attach(self, registry) -> bool:
+        '''
+        Подключает реестр к движку из снимка: игроки сезона заново находятся в реестре по никам.
+        False - реестр сводит разных игроков сезона в одного, движок с ним не годится.
+        '''
+        ids = registry.ids(self.nicknames).astype(np.int64)
+        if len(np.unique(ids)) != len(ids):
+            return False
+        self.registry = registry
+        self.registry_ids = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int64)
+        self.registry_ids[ids] = np.arange(len(ids))
+        return True
+
+    def _lookup(self, nick: str) -> Optional[int]:
+        if self.registry is None:
+            return self.ids.get(nick)
+        player_id = self.registry.get(nick)
+        if player_id is None or player_id >= len(self.registry_ids) or self.registry_ids[player_id] < 0:
+            return None
+        return int(self.registry_ids[player_id])
+
+    def player_ids(self, nicks: Sequence[str]) -> np.ndarray:
+        '''Возвращает номера игроков, заводя новых игроков с начальным рейтингом.'''
+        if self.registry is not None:
+            ids = self._season_ids(self.registry.ids(nicks))
+        else:
+            ids = np.empty(len(nicks), dtype=np.int64)
+            for i, nick in enumerate(nicks):
+                player_id = self.ids.get(nick)
+                if player_id is None:
+                    player_id = self.ids[nick] = len(self.nicknames)
+                    self.nicknames.append(nick)
+                ids[i] = player_id
+        if len(self.nicknames) > len(self.rating):
+            self._grow(len(self.nicknames))
+        return ids
+
+    def _season_ids(self, registry_ids: np.ndarray) -> np.ndarray:
+        '''Переводит номера реестра в номера сезона, новые игроки получают следующие номера по порядку строк.'''
+        if len(registry_ids) and registry_ids.max() >= len(self.registry_ids):
+            added = max(int(registry_ids.max()) + 1, 2 * len(self.registry_ids)) - len(self.registry_ids)
+            self.registry_ids = np.concatenate([self.registry_ids, np.full(added, -1, dtype=np.int64)])
+        ids = self.registry_ids[registry_ids]
+        if (ids < 0).any():
+            new, first = np.unique(registry_ids[ids < 0], return_index=True)
+            new = new[np.argsort(first)]
+            self.registry_ids[new] = np.arange(len(self.nicknames), len(self.nicknames) + len(new))
+            self.nicknames.extend(self.registry.name(i) for i in new.tolist())
+            ids = self.registry_ids[registry_ids]
+        return ids
+
+    def _grow(self, size: int):
+        capacity = max(size, 2 * len(self.rating), 64)
+        added = capacity - len(self.rating)
+        self.rating = np.concatenate([self.rating, np.full(added, self.initial_rating)])
+        self.tours_count = np.concatenate([self.tours_count, np.zeros(added, dtype=np.int64)])
+        self.dops = np.concatenate([self.dops, np.zeros(added)])
+        self.points = np.concatenate([self.points, np.zeros(added)])
+
+    def apply_series(self, tour: float, nicks: Sequence[str], place: Sequence[int], points: Sequence[float],
+                     dops: Sequence[float], wins: Optional[Sequence[int]] = None,
+                     games: Optional[Sequence[int]] = None) -> np.ndarray:
+        '''Сворачивает одну серию (строки в порядке таблицы) и возвращает изменения рейтинга.'''
+        ids = self.player_ids(nicks)
+        series = SeriesArrays(
+            tour,
+            ids,
+            np.asarray(place, dtype=np.int64),
+            np.asarray(points, dtype=np.float64),
+            np.asarray(dops, dtype=np.float64),
+            np.asarray(wins if wins is not None else np.zeros(len(ids)), dtype=np.int64),
+            np.asarray(games if games is not None else np.zeros(len(ids)), dtype=np.int64),
+        )
+        before = self.rating[ids]
+        # формула считается до изменения массивов: серию, которую она отвергла, движок не сворачивает
+        delta, columns = self.formula(before, series)
+        tours_before = self.tours_count[ids]
+        np.add.at(self.tours_count, ids, 1)
+        np.add.at(self.dops, ids, series.dops)
+        np.add.at(self.points, ids, series.points)
+        self.rating[ids] = before + delta
+        self._reindex(ids, before, tours_before)
+        self.log.append(tour, ids, series.place, series.points, series.dops, series.wins, series.games,
+                        before, self.rating[ids], columns)
+        return delta
+
+    def _reindex(self, ids: np.ndarray, before: np.ndarray, tours_before: np.ndarray):
+        '''Переставляет сыгравших в серии игроков в упорядоченных таблицах.'''
+        _, first = np.unique(ids, return_index=True)
+        for player_id, rating_before, count in zip(ids[first].tolist(), before[first].tolist(),
+                                                   tours_before[first].tolist()):
+            old_key = (-rating_before, player_id)
+            new_key = (-float(self.rating[player_id]), player_id)
+            if count:
+                self.ranking.discard(old_key)
+            self.ranking.add(new_key)
+            if count >= FINAL_MIN_SERIES:
+                self.finalists.discard(old_key)
+            if self.tours_count[player_id] >= FINAL_MIN_SERIES:
+                self.finalists.add(new_key)
+
+    def copy(self) -> "RatingEngine":
+        engine = RatingEngine(self.formula, self.initial_rating, self.registry)
+        engine.ids = dict(self.ids)
+        engine.registry_ids = self.registry_ids.copy()
+        engine.nicknames = list(self.nicknames)
+        engine.rating = self.rating.copy()
+        engine.tours_count = self.tours_count.copy()
+        engine.dops = self.dops.copy()
+        engine.points = self.points.copy()
+        engine.log = self.log.copy()
+        engine.ranking = self.ranking.copy()
+        engine.finalists = self.finalists.copy()
+        return engine
+
+    def snapshot(self, series: int) -> Standings:
+        '''Неизменяемая таблица на текущий момент, series - число свернутых серий.'''
+        size = len(self.nicknames)
+        arrays = []
+        for values in (self.rating, self.tours_count, self.dops, self.points):
+            values = values[:size].copy()
+            values.flags.writeable = False
+            arrays.append(values)
+        return Standings(series, tuple(self.nicknames), *arrays)
+
+    def order(self) -> np.ndarray:
+        '''Номера игроков по убыванию рейтинга (при равенстве - в порядке появления).'''
+        return np.fromiter((player_id for _, player_id in self.ranking), dtype=np.int64, count=len(self.ranking))
+
+    def rank(self, nick: str, min_series: int = 0) -> Optional[int]:
+        '''Место игрока в таблице (или среди финалистов при min_series=FINAL_MIN_SERIES), None - нет в таблице.'''
+        player_id = self._lookup(nick)
+        if player_id is None or self.tours_count[player_id] < max(min_series, 1):
+            return None
+        key = (-float(self.rating[player_id]), player_id)
+        if min_series == FINAL_MIN_SERIES:
+            return self.finalists.index(key) + 1
+        if min_series <= 1:
+            return self.ranking.index(key) + 1
+        return sum(1 for _ in self._ranked(min_series, key)) + 1
+
+    def _ranked(self, min_series: int, stop_key=None):
+        index = self.finalists if min_series == FINAL_MIN_SERIES else self.ranking
+        for key in index:
+            if key == stop_key:
+                return
+            if self.tours_count[key[1]] >= min_series:
+                yield key[1]
+
+    def top(self, k: int, min_series: int = 0) -> List[Tuple[str, float, int, float, float]]:
+        '''Первые k строк таблицы без сортировки всех игроков.'''
+        ids = []
+        for player_id in self._ranked(min_series):
+            if len(ids) >= k:
+                break
+            ids.append(player_id)
+        return self._rows(np.asarray(ids, dtype=np.int64))
+
+    def standings(self, min_series: int = 0) -> List[Tuple[str, float, int, float, float]]:
+        '''Строки таблицы по убыванию рейтинга: ник, рейтинг, число серий, сумма допов, сумма баллов.'''
+        return self._rows(np.fromiter(self._ranked(min_series), dtype=np.int64))
+
+    def _rows(self, order: np.ndarray) -> List[Tuple[str, float, int, float, float]]:
+        return list(zip(
+            [self.nicknames[i] for i in order],
+            self.rating[order].tolist(),
+            self.tours_count[order].tolist(),
+            self.dops[order].tolist(),
+            self.points[order].tolist(),
+        ))
+
+    def as_dict(self, values: np.ndarray) -> dict:
+        return dict(zip(self.nicknames, values[:len(self)].tolist()))
+
+    def history(self):
+        '''Результаты расчета по сериям в виде pandas.DataFrame (строится только по запросу).'''
+        return self.log.to_frame(self.nicknames, self.formula.series_columns)
+
+    def timeline(self, nick: str) -> Dict[str, np.ndarray]:
+        '''Хронология рейтинга игрока по сыгранным им сериям.'''
+        player_id = self._lookup(nick)
+        return self.log.timeline(player_id if player_id is not None else len(self.nicknames))
+
+    def ranking_at(self, k: int) -> List[Tuple[str, float]]:
+        '''Таблица после серии k (с нуля): ники и рейтинг по убыванию рейтинга.'''
+        ratings = self.log.ratings_at(k, len(self))
+        played = np.nonzero(~np.isnan(ratings))[0]
+        order = played[np.argsort(-ratings[played], kind='stable')]
+        return [(self.nicknames[i], float(ratings[i])) for i in order]
+
+    def rank_at(self, nick: str, k: int) -> Optional[int]:
+        '''Место игрока после серии k (с нуля) или None, если он еще не играл.'''
+        player_id = self._lookup(nick)
+        if player_id is None:
+            return None
+        ratings = self.log.ratings_at(k, len(self))
+        if np.isnan(ratings[player_id]):
+            return None
+        played = ~np.isnan(ratings)
+        higher = np.count_nonzero(ratings[played] > ratings[player_id])
+        earlier_ties = np.count_nonzero(ratings[:player_id][played[:player_id]] == ratings[player_id])
+        return int(higher + earlier_ties + 1)
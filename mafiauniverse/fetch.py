@@ -0,0 +1,69 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+import requests
+
+from mafiauniverse.profiling import span
+
+MAX_WORKERS = 8
+
+
+def fetch_page(session: requests.Session, url: str, skip_errors: bool = False) -> Optional[bytes]:
+    '''Функция скачивает страницу, с skip_errors=True при ошибке возвращает None.'''
+    try:
+        response = session.get(url)
+        response.raise_for_status()
+    except requests.RequestException:
+        if skip_errors:
+            return None
+        raise
+    return response.content
+
+
+def fetch_pages(session: requests.Session, urls: List[str], max_workers: int = MAX_WORKERS,
+                skip_errors: bool = False) -> List[Optional[bytes]]:
+    '''
+    Функция параллельно скачивает страницы, сохраняя исходный порядок ссылок.
+    С skip_errors=True вместо неудачно скачанной страницы возвращается None.
+    '''
+    def fetch(url):
+        return fetch_page(session, url, skip_errors)
+
+    with span("download", pages=len(urls)):
+        if max_workers <= 1 or len(urls) <= 1:
+            return [fetch(url) for url in urls]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+            return list(pool.map(fetch, urls))
+
+
+def iter_pages(session: requests.Session, urls: List[str], max_workers: int = MAX_WORKERS,
+               skip_errors: bool = False) -> Iterator[Optional[bytes]]:
+    '''
+    Функция отдает страницы по одной в порядке ссылок, пока вызывающий обрабатывает страницу,
+    следующие уже скачиваются. Вперед скачивается не больше max_workers страниц.
+    '''
+    def fetch(url):
+        with span("download", pages=1):
+            return fetch_page(session, url, skip_errors)
+
+    if not urls:
+        return
+    urls = iter(urls)
+    window = deque()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        try:
+            for url in urls:
+                window.append(pool.submit(fetch, url))
+                if len(window) >= max(1, max_workers):
+                    break
+            while window:
+                page = window.popleft().result()
+                url = next(urls, None)
+                if url is not None:
+                    window.append(pool.submit(fetch, url))
+                yield page
+        finally:
+            # вызывающий остановился раньше: еще не начатые загрузки отменяются
+            for future in window:
+                future.cancel()
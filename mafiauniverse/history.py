@@ -0,0 +1,148 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+COLUMN_TYPES = {
+    'series': np.int16,
+    'player': np.int32,
+    'place': np.int16,
+    'points': np.float32,
+    'dops': np.float32,
+    'wins': np.int16,
+    'games': np.int16,
+    'rating_before': np.float32,
+    'rating': np.float64,
+}
+
+
+class RatingHistory():
+    '''
+    Компактная история рейтинга сезона: строка на игрока в серии, игроки - целые номера,
+    места и игры - малые целые, баллы и рейтинг до серии - float32. Рейтинг после серии
+    хранится в float64, как в движке: иначе равные в таблице рейтинги после округления
+    расходились бы с местами rank. Индекс смещений по игрокам
+    строится один раз после добавления серий и дает хронологию игрока
+    за O(число его серий).
+    '''
+
+    def __init__(self):
+        self.tours: List[float] = []
+        self._chunks: List[Dict[str, np.ndarray]] = []
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.tours)
+
+    def append(self, tour: float, player: np.ndarray, place: np.ndarray, points: np.ndarray, dops: np.ndarray,
+               wins: np.ndarray, games: np.ndarray, rating_before: np.ndarray, rating: np.ndarray,
+               extra: Optional[Dict[str, np.ndarray]] = None):
+        chunk = {
+            'series': np.full(len(player), len(self.tours)),
+            'player': player,
+            'place': place,
+            'points': points,
+            'dops': dops,
+            'wins': wins,
+            'games': games,
+            'rating_before': rating_before,
+            'rating': rating,
+        }
+        chunk = {name: np.asarray(values, dtype=COLUMN_TYPES[name]) for name, values in chunk.items()}
+        for name, values in (extra or {}).items():
+            chunk[name] = np.asarray(values, dtype=np.float32)
+        self.tours.append(tour)
+        self._chunks.append(chunk)
+        self._columns = self._order = self._offsets = None
+
+    def copy(self) -> "RatingHistory":
+        history = RatingHistory()
+        history.tours = list(self.tours)
+        history._chunks = list(self._chunks)
+        return history
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        if self._columns is None:
+            if not self._chunks:
+                return {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMN_TYPES.items()}
+            self._columns = {
+                name: np.concatenate([chunk[name] for chunk in self._chunks]) for name in self._chunks[0]
+            }
+            self._chunks = [self._columns]
+        return self._columns
+
+    def _index(self):
+        '''Строки, упорядоченные по игроку и серии, и смещения начала строк каждого игрока.'''
+        if self._order is None:
+            player = self.columns['player']
+            self._order = np.argsort(player, kind='stable')
+            counts = np.bincount(player, minlength=int(player.max()) + 1 if len(player) else 0)
+            self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self._order, self._offsets
+
+    def timeline(self, player_id: int) -> Dict[str, np.ndarray]:
+        '''Серии игрока по порядку: номер серии, место, рейтинг до и после серии.'''
+        order, offsets = self._index()
+        if player_id + 1 >= len(offsets):
+            rows = order[:0]
+        else:
+            rows = order[offsets[player_id]:offsets[player_id + 1]]
+        columns = self.columns
+        series = columns['series'][rows]
+        return {
+            'series': series,
+            'tour': np.asarray(self.tours)[series] if len(self.tours) else np.zeros(0),
+            'place': columns['place'][rows],
+            'rating_before': columns['rating_before'][rows],
+            'rating': columns['rating'][rows],
+        }
+
+    def ratings_at(self, k: int, players_count: int) -> np.ndarray:
+        '''Рейтинг каждого игрока после серии k (с нуля), NaN - игрок еще не играл.'''
+        order, offsets = self._index()
+        columns = self.columns
+        ratings = np.full(players_count, np.nan)
+        if not len(order):
+            return ratings
+        played = (columns['series'][order] <= k).astype(np.int64)
+        starts = offsets[:-1]
+        present = offsets[1:] > starts
+        counts = np.zeros(len(starts), dtype=np.int64)
+        counts[present] = np.add.reduceat(played, starts[present])
+        players = np.nonzero(counts)[0]
+        last = order[starts[players] + counts[players] - 1]
+        ratings[players] = columns['rating'][last]
+        return ratings
+
+    def to_frame(self, nicknames: Sequence[str], series_columns: Sequence[str]):
+        '''
+        История в виде pandas.DataFrame в прежнем формате Season.history:
+        строки серии по убыванию баллов, ники - категориальный столбец.
+        '''
+        import pandas as pd
+
+        columns = self.columns
+        order = np.lexsort((-columns['points'], columns['series']))
+        data = {
+            'Tour': np.asarray(self.tours)[columns['series']] if len(self.tours) else np.zeros(0),
+            'Nick': pd.Categorical.from_codes(columns['player'], categories=list(nicknames)),
+            'Place': columns['place'],
+            'Points': columns['points'],
+            'Dops': columns['dops'],
+            'Wins': columns['wins'],
+            'Games': columns['games'],
+        }
+        data = {column: data[column] for column in series_columns}
+        data['Rating_before'] = columns['rating_before']
+        for name, values in columns.items():
+            if name not in COLUMN_TYPES:
+                data[name] = values
+        data['Delta'] = columns['rating'] - columns['rating_before']
+        data['Rating'] = columns['rating']
+        return pd.DataFrame(data).iloc[order].reset_index(drop=True)
+
+    def to_parquet(self, path: str, nicknames: Sequence[str], series_columns: Sequence[str]):
+        '''Выгрузка истории в Parquet (нужен pyarrow или fastparquet).'''
+        self.to_frame(nicknames, series_columns).to_parquet(path, index=False)
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from mafiauniverse.cache import CACHE_DIR
+
+REGISTRY_PATH = os.path.join(CACHE_DIR, "players.json")
+
+
+def normalize(nick: str) -> str:
+    '''Ключ ника: пробелы схлопнуты, регистр сложен (casefold).'''
+    return " ".join(nick.split()).casefold()
+
+
+class PlayerRegistry():
+    '''
+    Реестр игроков: ник нормализуется один раз и получает плотный целый номер,
+    написание ника со страницы запоминается, поэтому повторные серии не нормализуют его заново.
+    Переименованных игроков связывают псевдонимами. Реестр только растет, номера не меняются.
+
+    Parameters
+    ----------
+    path : str
+        Файл JSON, в котором реестр хранится между запусками (None - только в памяти)
+    '''
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.names: List[str] = []
+        self.aliases: Dict[str, str] = {}
+        self._keys: Dict[str, int] = {}
+        self._raw: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def _load(self, path: str):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # битый файл: реестр собирается заново и перезапишет его
+            return
+        for name in data.get("names", []):
+            self._keys.setdefault(normalize(name), len(self.names))
+            self.names.append(name)
+        for alias, name in data.get("aliases", {}).items():
+            self.aliases[alias] = name
+            self._keys[alias] = self._keys[normalize(name)]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def id(self, nick: str) -> int:
+        '''Номер игрока, новый ник получает следующий номер.'''
+        player_id = self._raw.get(nick)
+        if player_id is not None:
+            return player_id
+        with self._lock:
+            name = " ".join(nick.split())
+            key = name.casefold()
+            player_id = self._keys.get(key)
+            if player_id is None:
+                player_id = self._keys[key] = len(self.names)
+                # ник со страницы обычно уже без лишних пробелов: хранится он сам, а не копия
+                self.names.append(nick if name == nick else name)
+                self._dirty = True
+            self._raw[nick] = player_id
+        return player_id
+
+    def ids(self, nicks: Sequence[str]) -> np.ndarray:
+        return np.fromiter((self.id(nick) for nick in nicks), dtype=np.int32, count=len(nicks))
+
+    def get(self, nick: str) -> Optional[int]:
+        '''Номер игрока без заведения нового, None - ник неизвестен.'''
+        player_id = self._raw.get(nick)
+        return player_id if player_id is not None else self._keys.get(normalize(nick))
+
+    def name(self, player_id: int) -> str:
+        '''Ник игрока в том написании, в котором он впервые попал в реестр.'''
+        return self.names[player_id]
+
+    def canonical(self, nick: str) -> str:
+        return self.names[self.id(nick)]
+
+    def add_alias(self, alias: str, nick: str):
+        '''Связывает прежний ник alias с игроком nick (результаты под alias идут игроку nick).'''
+        player_id = self.id(nick)
+        with self._lock:
+            key = normalize(alias)
+            self.aliases[key] = self.names[player_id]
+            self._keys[key] = player_id
+            self._raw.clear()
+            self._dirty = True
+
+    def exclusion(self, nicks: Iterable[str]) -> FrozenSet[int]:
+        '''Множество номеров игроков для проверки "вне зачета" за O(1).'''
+        return frozenset(self.id(nick) for nick in nicks)
+
+    @property
+    def revision(self) -> str:
+        '''Отпечаток псевдонимов: при их смене уже посчитанные сезоны нужно пересчитать.'''
+        return hashlib.sha1(json.dumps(sorted(self.aliases.items()), ensure_ascii=False).encode()).hexdigest()
+
+    def save(self):
+        '''Сохраняет реестр, если в нем появились новые игроки или псевдонимы.'''
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            data = {"names": list(self.names), "aliases": dict(self.aliases)}
+            self._dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # свой временный файл у каждого писателя: реестр сохраняют потоки обновления сервисов и воркеры бота
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+_REGISTRY: Optional[PlayerRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def default_registry() -> PlayerRegistry:
+    '''Общий для процесса реестр игроков, хранящийся рядом с кэшем серий.'''
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            _REGISTRY = PlayerRegistry(REGISTRY_PATH)
+        return _REGISTRY
@@ -0,0 +1,139 @@
+'''
+Замеры стадий расчета рейтинга (токен формы, поиск, сезон, загрузка и разбор страниц, свертка).
+
+Режим задается переменной окружения MAFIA_PROFILE или функцией configure:
+
+    json        - строка JSON на каждую стадию (в MAFIA_PROFILE_PATH или stderr)
+    prometheus  - суммы и счетчики по стадиям в текстовом формате Prometheus,
+                  файл MAFIA_PROFILE_PATH перезаписывается после каждого расчета
+    cprofile    - весь расчет под cProfile, статистика в MAFIA_PROFILE_PATH (каталог)
+
+Без режима span возвращает один и тот же пустой контекст, и замеры ничего не стоят.
+'''
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import warnings
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+MODES = ("json", "prometheus", "cprofile")
+NOOP = nullcontext()
+
+_mode: Optional[str] = None
+_path: Optional[str] = None
+_lock = threading.Lock()
+_local = threading.local()
+_totals: Dict[str, list] = defaultdict(lambda: [0.0, 0])
+
+
+def configure(mode: Optional[str] = None, path: Optional[str] = None):
+    '''Включает режим замеров (None - выключить) и сбрасывает накопленные суммы.'''
+    global _mode, _path
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"Unknown profiling mode: {mode}")
+    with _lock:
+        _mode, _path = mode, path
+        _totals.clear()
+
+
+def enabled() -> bool:
+    return _mode is not None
+
+
+def span(name: str, **labels):
+    '''Контекст замера стадии name, labels попадают в запись (например, число страниц).'''
+    if _mode is None or _mode == "cprofile":
+        return NOOP
+    return _span(name, labels)
+
+
+@contextmanager
+def _span(name: str, labels: dict):
+    stack = _local.__dict__.setdefault("stack", [])
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    start = time.time()
+    counter = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - counter
+        stack.pop()
+        _record(name, parent, start, seconds, labels)
+
+
+def _record(name: str, parent: Optional[str], start: float, seconds: float, labels: dict):
+    with _lock:
+        totals = _totals[name]
+        totals[0] += seconds
+        totals[1] += 1
+        if _mode != "json":
+            return
+        line = json.dumps({"span": name, "parent": parent, "start": start, "seconds": seconds,
+                           "thread": threading.current_thread().name, **labels}, ensure_ascii=False)
+        if _path:
+            with open(_path, "a", encoding="utf-8") as f:
+                print(line, file=f)
+        else:
+            print(line, file=sys.stderr)
+
+
+def prometheus_text() -> str:
+    '''Накопленное время стадий в текстовом формате Prometheus.'''
+    lines = [
+        "# HELP mafia_stage_seconds Time spent in rating calculation stages",
+        "# TYPE mafia_stage_seconds summary",
+    ]
+    with _lock:
+        for name, (seconds, count) in sorted(_totals.items()):
+            lines.append(f'mafia_stage_seconds_sum{{stage="{name}"}} {seconds:.6f}')
+            lines.append(f'mafia_stage_seconds_count{{stage="{name}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def traced(name: str) -> Callable:
+    '''
+    Декоратор расчета целиком: стадия name, в режиме prometheus - запись сумм в файл,
+    в режиме cprofile - прогон под cProfile со статистикой в файле {name}-{время}.prof.
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _mode is None:
+                return func(*args, **kwargs)
+            if _mode == "cprofile":
+                profile = cProfile.Profile()
+                try:
+                    return profile.runcall(func, *args, **kwargs)
+                finally:
+                    directory = _path or "."
+                    os.makedirs(directory, exist_ok=True)
+                    profile.dump_stats(os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.prof"))
+            try:
+                with span(name):
+                    return func(*args, **kwargs)
+            finally:
+                if _mode == "prometheus" and _path:
+                    with open(_path + ".tmp", "w", encoding="utf-8") as f:
+                        f.write(prometheus_text())
+                    os.replace(_path + ".tmp", _path)
+        return wrapper
+    return decorator
+
+
+def _configure_from_env():
+    mode = os.environ.get("MAFIA_PROFILE") or None
+    if mode is not None and mode not in MODES:
+        # опечатка в переменной окружения не должна ломать импорт модулей рейтинга
+        warnings.warn(f"Unknown MAFIA_PROFILE={mode!r}, profiling is disabled (expected one of {', '.join(MODES)})")
+        mode = None
+    configure(mode, os.environ.get("MAFIA_PROFILE_PATH") or None)
+
+
+_configure_from_env()
@@ -0,0 +1,81 @@
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import Iterator, List, Tuple
+
+LOAD = 256
+
+Key = Tuple[float, int]
+
+
+class RankIndex():
+    '''
+    Упорядоченный список ключей (-рейтинг, номер игрока), разбитый на корзины:
+    вставка, удаление и место игрока за O(log n + n / LOAD), первые k игроков -
+    без сортировки всей таблицы.
+    '''
+
+    def __init__(self):
+        self._buckets: List[List[Key]] = []
+        self._maxes: List[Key] = []
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, key: Key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+        else:
+            i = min(bisect_left(self._maxes, key), len(self._buckets) - 1)
+            bucket = self._buckets[i]
+            insort(bucket, key)
+            self._maxes[i] = bucket[-1]
+            if len(bucket) > 2 * LOAD:
+                self._buckets[i:i + 1] = [bucket[:LOAD], bucket[LOAD:]]
+                self._maxes[i:i + 1] = [bucket[LOAD - 1], bucket[-1]]
+        self._len += 1
+
+    def _locate(self, key: Key) -> Tuple[int, int]:
+        i = bisect_left(self._maxes, key)
+        if i == len(self._buckets):
+            return -1, -1
+        j = bisect_left(self._buckets[i], key)
+        if j < len(self._buckets[i]) and self._buckets[i][j] == key:
+            return i, j
+        return -1, -1
+
+    def discard(self, key: Key) -> bool:
+        i, j = self._locate(key)
+        if i < 0:
+            return False
+        bucket = self._buckets[i]
+        del bucket[j]
+        self._len -= 1
+        if bucket:
+            self._maxes[i] = bucket[-1]
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+        return True
+
+    def index(self, key: Key) -> int:
+        '''Позиция ключа с нуля (ValueError, если ключа нет).'''
+        i, j = self._locate(key)
+        if i < 0:
+            raise ValueError(f"{key} is not in index")
+        return sum(len(bucket) for bucket in self._buckets[:i]) + j
+
+    def __iter__(self) -> Iterator[Key]:
+        for bucket in self._buckets:
+            yield from bucket
+
+    def head(self, k: int) -> List[Key]:
+        return list(islice(iter(self), k))
+
+    def copy(self) -> "RankIndex":
+        index = RankIndex()
+        index._buckets = [list(bucket) for bucket in self._buckets]
+        index._maxes = list(self._maxes)
+        index._len = self._len
+        return index
@@ -0,0 +1,134 @@
+'''
+Готовые к отправке представления рейтинга: таблица JSON, карточки игроков и страница
+первых 20 мест (HTML и текст). Они строятся один раз на обновление рейтинга,
+ответ бота - поиск по словарю. При обновлении заново форматируются только строки
+игроков, у которых изменились место или данные.
+'''
+import html
+import json
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+TOP = 20
+
+
+def render_card(place: int, row: dict) -> str:
+    return f"{place}. {row['nickname']} — рейтинг {row['rating']}, серий {row['series_count']}"
+
+
+def render_html(rows: Sequence[dict]) -> str:
+    '''Таблица HTML в разметке pandas (как DataFrame._repr_html_) без построения DataFrame.'''
+    if not rows:
+        return '<table border="1" class="dataframe">\n</table>'
+    columns = list(rows[0])
+    head = "".join(f"<th>{html.escape(str(column))}</th>" for column in columns)
+    body = "".join(
+        f"<tr><th>{i}</th>" + "".join(f"<td>{_cell(row[column])}</td>" for column in columns) + "</tr>\n"
+        for i, row in enumerate(rows)
+    )
+    return (
+        '<table border="1" class="dataframe">\n'
+        f'<thead><tr style="text-align: right;"><th></th>{head}</tr></thead>\n'
+        f"<tbody>\n{body}</tbody>\n</table>"
+    )
+
+
+def _cell(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.6f}"
+    return html.escape(str(value))
+
+
+@dataclass(frozen=True)
+class RenderedStandings:
+    '''
+    Версия готовых представлений рейтинга, не меняется после построения.
+
+    Parameters
+    ----------
+    version : int
+        Номер версии, растет при каждом изменении рейтинга
+    table_json : str
+        Таблица рейтинга в JSON (в том виде, в каком ее вернула функция расчета)
+    players : dict[str, dict]
+        Строка игрока с местом по нормализованному нику
+    cards : dict[str, str]
+        Текст карточки игрока по нормализованному нику
+    top_html, top_text : str
+        Первые места таблицы в HTML и текстом
+    '''
+    version: int
+    table_json: str
+    players: Dict[str, dict]
+    cards: Dict[str, str]
+    top_html: str
+    top_text: str
+    _states: Dict[str, tuple] = field(default_factory=dict, repr=False)
+    _fragments: Dict[tuple, str] = field(default_factory=dict, repr=False)
+    _top: tuple = field(default=(), repr=False)
+
+
+class StandingsRenderer():
+    '''
+    Строит RenderedStandings по таблице рейтинга (список строк nickname, rating, series_count),
+    переиспользуя форматирование неизменившихся игроков из предыдущей версии.
+
+    Parameters
+    ----------
+    normalize : Callable[[str], str]
+        Ключ ника для поиска игрока
+    top : int
+        Сколько первых мест попадает на страницу
+    '''
+
+    def __init__(self, normalize: Callable[[str], str], top: int = TOP):
+        self.normalize = normalize
+        self.top = top
+        self.current: Optional[RenderedStandings] = None
+
+    def update(self, rating: List[dict]) -> RenderedStandings:
+        '''Новая версия представлений; если в таблице ничего не изменилось - текущая версия.'''
+        previous = self.current
+        old_states = previous._states if previous else {}
+        old_fragments = previous._fragments if previous else {}
+        states, players, cards, fragments, parts = {}, {}, {}, {}, []
+        changed = previous is None
+        for place, row in enumerate(rating, start=1):
+            items = tuple(row.items())
+            fragment = old_fragments.get(items)
+            if fragment is None:
+                fragment = json.dumps(row, ensure_ascii=False)
+            fragments[items] = fragment
+            parts.append(fragment)
+            key = self.normalize(row['nickname'])
+            if key in states:
+                continue
+            state = states[key] = (place, items)
+            if old_states.get(key) == state:
+                players[key], cards[key] = previous.players[key], previous.cards[key]
+                continue
+            changed = True
+            data = row.copy()
+            data['place'] = place
+            players[key], cards[key] = data, render_card(place, row)
+        if not changed and len(states) == len(old_states):
+            return previous
+
+        top = tuple((place, tuple(row.items())) for place, row in enumerate(rating[:self.top], start=1))
+        if previous is not None and top == previous._top:
+            top_html, top_text = previous.top_html, previous.top_text
+        else:
+            top_html = render_html(rating[:self.top])
+            top_text = "\n".join(render_card(place, row) for place, row in enumerate(rating[:self.top], start=1))
+        self.current = RenderedStandings(
+            version=previous.version + 1 if previous else 1,
+            table_json=f"[{', '.join(parts)}]",
+            players=players,
+            cards=cards,
+            top_html=top_html,
+            top_text=top_text,
+            _states=states,
+            _fragments=fragments,
+            _top=top,
+        )
+        return self.current
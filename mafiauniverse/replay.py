@@ -0,0 +1,187 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+SEARCH_TEXT = re.compile(rb'name="searchText"\r\n\r\n(.*?)\r\n', re.DOTALL)
+
+
+def request_key(method: str, url: str, search_text: Optional[str] = None) -> str:
+    '''
+    Ключ запроса в записи: метод и путь с параметрами. Для поиска добавляется
+    поле searchText формы, остальные поля (граница формы, год) не учитываются.
+    '''
+    parts = urlsplit(url)
+    key = f"{method.upper()} {parts.path}"
+    if parts.query:
+        key += f"?{parts.query}"
+    if search_text:
+        key += f" searchText={search_text}"
+    return key
+
+
+def form_search_text(body: Optional[bytes]) -> Optional[str]:
+    '''Функция достает поле searchText из тела multipart-формы.'''
+    match = SEARCH_TEXT.search(body) if body else None
+    return match.group(1).decode() if match else None
+
+
+class Recording():
+    '''
+    Записанные ответы сайта: index.json с ключами запросов и файлы с телами ответов.
+
+    Parameters
+    ----------
+    path : str
+        Каталог записи
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        index_path = os.path.join(path, "index.json")
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                self.entries = {entry["key"]: entry for entry in json.load(f)}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, status: int, content_type: str, body: bytes):
+        with self._lock:
+            entry = self.entries.get(key)
+            file_name = entry["file"] if entry else f"{len(self.entries):04d}.html"
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, file_name), "wb") as f:
+                f.write(body)
+            self.entries[key] = {"key": key, "status": status, "content_type": content_type, "file": file_name}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, "index.json"), "w", encoding="utf-8") as f:
+                json.dump(list(self.entries.values()), f, ensure_ascii=False, indent=1)
+
+    def body(self, key: str) -> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        with open(os.path.join(self.path, entry["file"]), "rb") as f:
+            return f.read()
+
+
+class RecordingSession(requests.Session):
+    '''Сессия requests, которая записывает все ответы в Recording.'''
+
+    def __init__(self, recording: Recording):
+        super().__init__()
+        self.recording = recording
+
+    def request(self, method, url, *args, **kwargs):
+        # форма поиска уходит готовым телом в байтах: поле searchText достается из него, как на сервере
+        data = kwargs.get("data")
+        search_text = form_search_text(data) if isinstance(data, bytes) else None
+        response = super().request(method, url, *args, **kwargs)
+        self.recording.add(
+            request_key(method, url, search_text),
+            response.status_code,
+            response.headers.get("Content-Type", "text/html; charset=utf-8"),
+            response.content,
+        )
+        return response
+
+
+class ReplayServer():
+    '''
+    Локальный HTTP-сервер, отдающий записанные ответы с заданной задержкой.
+
+    Parameters
+    ----------
+    recording : Recording
+        Запись, по которой отвечает сервер
+    latency : float
+        Средняя задержка ответа в секундах
+    jitter : float
+        Разброс задержки в секундах (равномерно в обе стороны)
+    '''
+
+    def __init__(self, recording: Recording, latency: float = 0.0, jitter: float = 0.0):
+        self.recording = recording
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.bytes_sent = 0
+        self.misses = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.misses = []
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay(self):
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else None
+                key = request_key(self.command, self.path, form_search_text(body))
+                entry = server.recording.entries.get(key)
+                server._delay()
+                if entry is None:
+                    content, status, content_type = b"", 404, "text/plain"
+                else:
+                    content, status, content_type = server.recording.body(key), entry["status"], entry["content_type"]
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(content)
+                    if entry is None:
+                        server.misses.append(key)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = _reply
+            do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,68 @@
+'''
+Несколько формул рейтинга за один проход по сезону: строки серии (ResultRow)
+собираются в колонки один раз и сворачиваются всеми формулами.
+'''
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+from mafiauniverse.engine import INITIAL_RATING, RatingEngine
+from mafiauniverse.players import PlayerRegistry
+from mafiauniverse.tables import ResultRow
+
+
+class Scoreboard():
+    '''
+    Рейтинги сезона по нескольким формулам: у каждой формулы свой RatingEngine,
+    колонки серии собираются один раз и передаются всем формулам.
+
+    Parameters
+    ----------
+    formulas : dict[str, formula]
+        Формулы рейтинга по имени
+    initial_rating : float
+        Рейтинг игрока до первой серии
+    registry : PlayerRegistry
+        Реестр игроков (None - ники сравниваются как есть)
+    '''
+
+    def __init__(self, formulas: Dict[str, Callable], initial_rating: float = INITIAL_RATING,
+                 registry: Optional[PlayerRegistry] = None):
+        self.registry = registry
+        self.engines = {name: RatingEngine(formula, initial_rating, registry) for name, formula in formulas.items()}
+
+    def __getitem__(self, name: str) -> RatingEngine:
+        return self.engines[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.engines)
+
+    def apply_rows(self, tour: float, rows: Sequence[ResultRow], exclude: Iterable[str] = (),
+                   names: Optional[Iterable[str]] = None):
+        '''
+        Сворачивает серию формулами names (None - всеми). Строки - ResultRow, их списки из кэша
+        или строки без побед и игр (место, ник, баллы, допы), тогда победы и игры нулевые.
+        '''
+        if self.registry is not None:
+            excluded = self.registry.exclusion(exclude)
+            rows = [row for row in rows if self.registry.id(row[1]) not in excluded]
+        else:
+            exclude = set(exclude)
+            rows = [row for row in rows if row[1] not in exclude]
+        nicks = [row[1] for row in rows]
+        place, points, dops, wins, games = (
+            np.array([row[i] if i < len(row) else 0 for row in rows], dtype=dtype)
+            for i, dtype in ((0, np.int64), (2, np.float64), (3, np.float64), (4, np.int64), (5, np.int64))
+        )
+        for name in self.engines if names is None else names:
+            self.engines[name].apply_series(tour, nicks, place, points, dops, wins, games)
+
+    def copy(self) -> "Scoreboard":
+        board = Scoreboard({}, registry=self.registry)
+        board.engines = {name: engine.copy() for name, engine in self.engines.items()}
+        return board
+
+    def standings(self, min_series: int = 0) -> Dict[str, list]:
+        '''Таблицы всех формул: ник, рейтинг, число серий, сумма допов, сумма баллов.'''
+        return {name: engine.standings(min_series) for name, engine in self.engines.items()}
+
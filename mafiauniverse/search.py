@@ -0,0 +1,68 @@
+import random
+import string
+from datetime import datetime
+
+import requests
+
+from mafiauniverse.profiling import span
+
+PAGE_SIZE = 25
+TOKEN_XPATH = '//form//input[@name="__RequestVerificationToken"]/@value'
+
+
+def parse_verification_token(response: requests.Response) -> str:
+    '''Функция достает __RequestVerificationToken со страницы с формой поиска.'''
+    from lxml import etree
+
+    tree = etree.fromstring(response.text, etree.HTMLParser())
+    return str(tree.xpath(TOKEN_XPATH)[0])
+
+
+def search_series(session: requests.Session, main_url: str, search_text: str, year: int = None,
+                  page: int = 1, page_size: int = PAGE_SIZE) -> requests.Response:
+    '''
+    Функция делает HTTP-запрос к веб-серверу для поиска серий турниров по названию.
+    Если сессия умеет хранить токены форм (Transport), страница с токеном
+    запрашивается только когда токен устарел или отвергнут сервером.
+    '''
+    from requests_toolbelt import MultipartEncoder
+
+    token_url = f"{main_url}/SerieOfTournaments/"
+    reusable = hasattr(session, "form_token")
+    while True:
+        with span("token", reused=reusable):
+            if reusable:
+                verification_token = session.form_token(token_url, parse_verification_token)
+                session_cookies = None
+            else:
+                token_request = session.get(token_url)
+                verification_token = parse_verification_token(token_request)
+                session_cookies = token_request.cookies
+        fields = {
+            "Page": str(page),
+            "Year": str(year or datetime.now().year),
+            "searchText": search_text,
+            "PageSize": str(page_size),
+        }
+        boundary = "----WebKitFormBoundary" + "".join(
+            random.sample(string.ascii_letters + string.digits, 16)
+        )
+        m = MultipartEncoder(fields=fields, boundary=boundary)
+        headers = {
+            "requestverificationtoken": verification_token,
+            "Content-Type": m.content_type,
+        }
+        with span("search"):
+            response = session.post(
+                f"{main_url}/SerieOfTournaments/Search",
+                cookies=session_cookies,
+                headers=headers,
+                # тело целиком в байтах: поток MultipartEncoder исчерпывается первой попыткой,
+                # и повтор Transport после 5xx ушел бы с пустым телом
+                data=m.to_string(),
+            )
+        if reusable and response.status_code in (400, 403):
+            session.forget_token(token_url)
+            reusable = False
+            continue
+        return response
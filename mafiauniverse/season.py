@@ -0,0 +1,270 @@
+'''
+Общая часть сезонов Энтропии и Магистрейтика: чтение списка серий, досчет рейтинга
+со снимка, потоковый расчет и запросы к таблице. Модуль рейтинга задает только
+формулу, разбор страниц и то, как строки серии попадают в движок.
+'''
+import os
+import time
+from abc import ABC, abstractmethod
+from math import ceil
+from typing import Any, Iterator, List, Optional
+
+import requests
+
+from mafiauniverse.cache import CACHE_DIR, TournamentCache, iter_series, load_series
+from mafiauniverse.engine import FINAL_MIN_SERIES, RatingEngine, Standings
+from mafiauniverse.fetch import MAX_WORKERS
+from mafiauniverse.players import PlayerRegistry, default_registry
+from mafiauniverse.profiling import span
+from mafiauniverse.render import TOP, render_html
+from mafiauniverse.seasons import current_season
+from mafiauniverse.simulate import simulate_finalists
+from mafiauniverse.snapshot import SeasonSnapshot, load_snapshot, save_snapshot, series_digest
+from mafiauniverse.tables import count_open_links
+
+MAIN_URL = "https://mafiauniverse.org"
+REVALIDATE_TTL = 24 * 3600
+
+
+class SeasonBase(ABC):
+    '''
+    Сезон серии турниров. Подкласс задает NAME (серия турниров в поиске МЮ), NAMESPACE
+    (имя кэша и снимка), parse_season, parse_tournament_links, parse_tour_results и apply_result.
+
+    Parameters
+    ----------
+    link_season_num : int
+        Номер сезона в ссылке на МЮ
+    formula : Callable
+        Формула рейтинга для RatingEngine
+    max_workers : int
+        Максимальное число одновременных загрузок страниц серий
+    cache : TournamentCache
+        Дисковый кэш результатов сыгранных серий (None - без кэша)
+    snapshot_path : str
+        Файл со снимком состояния сезона, с которого продолжается расчет (None - считать с нуля)
+    registry : PlayerRegistry
+        Реестр игроков (None - общий реестр процесса)
+    calculate : bool
+        Считать рейтинг при создании (False - досчитывается через refresh или stream)
+
+    Уже свернутые серии сверяются с сайтом не чаще раза в revalidate_ttl секунд:
+    их страницы скачиваются заново, и правка задним числом ведет к полному пересчету.
+    '''
+    NAME: str
+    NAMESPACE: str
+    MAIN_URL = MAIN_URL
+    revalidate_ttl = REVALIDATE_TTL
+
+    def __init__(self, session, link_season_num, formula, max_workers: int = MAX_WORKERS,
+                 cache: TournamentCache = None, snapshot_path: str = None, registry: PlayerRegistry = None,
+                 calculate: bool = True):
+
+        self.registry = registry if registry is not None else default_registry()
+        self.max_workers = max_workers
+        self.cache = cache
+        self.snapshot_path = snapshot_path
+        self.snapshot = load_snapshot(snapshot_path) if snapshot_path else None
+        self._link_season_num = link_season_num
+        self._validated = 0.0
+        self.open_links = 1
+
+        self.engine = RatingEngine(formula, registry=self.registry)
+
+        if calculate:
+            self.refresh(session)
+
+    @staticmethod
+    @abstractmethod
+    def parse_season(html_content: bytes) -> Optional[int]:
+        '''Номер сезона со страницы сезона.'''
+
+    @staticmethod
+    @abstractmethod
+    def parse_tournament_links(html_content: bytes) -> List[str]:
+        '''Ссылки на серии сезона, идущие в зачет, от первой к последней.'''
+
+    @staticmethod
+    @abstractmethod
+    def parse_tour_results(html_content: bytes) -> Any:
+        '''Результаты серии со страницы серии.'''
+
+    @abstractmethod
+    def apply_result(self, i: int, result: Any):
+        '''Сворачивает распарсенную i-ю серию сезона (с нуля) в рейтинг.'''
+
+    @property
+    def params(self) -> dict:
+        '''Параметры расчета, при смене которых снимок не годится.'''
+        return {"season": self._link_season_num, "players": self.registry.revision}
+
+    @property
+    def season_url(self) -> str:
+        return f"{self.MAIN_URL}/SerieOfTournament/Tournaments/{self._link_season_num}"
+
+    def read_links(self, session) -> List[str]:
+        '''
+        Функция читает ссылки на серии со страницы сезона и запоминает в open_links, сколько последних
+        из них могут еще играться (все столы последней серии): они не кэшируются и не входят в снимок.
+        '''
+        with span("tournament_links"):
+            response = session.get(self.season_url)
+            links = self.parse_tournament_links(response.content)
+            self.open_links = count_open_links(response.content, links)
+            return links
+
+    def refresh(self, session, links: List[str] = None, open_results: List[Any] = None):
+        '''
+        Перечитывает список серий сезона (или берет уже прочитанный read_links список links)
+        и досчитывает рейтинг по новым сериям. open_results - уже разобранные результаты
+        последних open_links серий links, тогда их страницы повторно не скачиваются.
+        '''
+        self.links = links if links is not None else self.read_links(session)
+        self.calculate_rating_over_season(session, open_results if links is not None else None)
+
+    def stream(self, session, links: List[str] = None) -> Iterator[Standings]:
+        '''
+        Досчитывает рейтинг как refresh, но отдает неизменяемую таблицу после каждой серии:
+        пока серия сворачивается, следующие страницы уже скачиваются.
+        При продолжении со снимка первой отдается таблица снимка.
+        '''
+        self.links = links if links is not None else self.read_links(session)
+        params, start, digests = self._resume(session)
+        if start:
+            yield self.engine.snapshot(start)
+        series = iter_series(session, self.MAIN_URL, self.links[start:], self.parse_tour_results,
+                             self.cache, self.max_workers, self.open_links)
+        for i, result in enumerate(series, start):
+            with span("fold", series=1):
+                digests = self._fold(i, result, params, digests)
+            yield self.engine.snapshot(i + 1)
+        self._save()
+
+    def calculate_rating_over_season(self, session, open_results: List[Any] = None):
+        params, start, digests = self._resume(session)
+        links = self.links[start:]
+        series = load_series(session, self.MAIN_URL, links, self.parse_tour_results, self.cache, self.max_workers,
+                             open_results, self.open_links)
+        with span("fold", series=len(links)):
+            for i, result in enumerate(series, start):
+                digests = self._fold(i, result, params, digests)
+        self._save()
+
+    def _resume(self, session):
+        '''Функция возвращает параметры расчета, индекс первой несвернутой серии и отпечатки свернутых.'''
+        params = self.params
+        start = self.snapshot.resume_index(params, self.links, self.open_links) if self.snapshot else None
+        if start is not None and time.time() - self.snapshot.validated >= self.revalidate_ttl:
+            start = self._revalidate(session, start)
+        if start is not None and not self.snapshot.restore(self):
+            start = None
+        if start is None:
+            self.engine = RatingEngine(self.engine.formula, registry=self.registry)
+            self._validated = time.time()
+            return params, 0, []
+        self._validated = self.snapshot.validated
+        return params, start, self.snapshot.digests
+
+    def _revalidate(self, session, start):
+        '''
+        Заново скачивает свернутые серии снимка мимо кэша и сверяет с их отпечатками.
+        Изменившиеся серии обновляются в кэше, и тогда возвращается None (нужен полный пересчет).
+        '''
+        links = self.snapshot.links
+        with span("revalidate", series=len(links)):
+            results = load_series(session, self.MAIN_URL, links, self.parse_tour_results, None, self.max_workers)
+            changed = self.snapshot.changed(results)
+        if not changed:
+            self.snapshot.validated = time.time()
+            return start
+        if self.cache is not None:
+            for i in changed:
+                self.cache.put(links[i], results[i])
+        return None
+
+    def _fold(self, i, result, params, digests):
+        if i == len(self.links) - self.open_links:
+            self.snapshot = SeasonSnapshot.capture(self, params, self.links[:i], digests, self._validated)
+        self.apply_result(i, result)
+        return digests + [series_digest(result)]
+
+    def _save(self):
+        if self.snapshot_path and self.snapshot is not None:
+            save_snapshot(self.snapshot_path, self.snapshot)
+        self.registry.save()
+
+    @property
+    def RATING(self):
+        return self.engine.as_dict(self.engine.rating)
+
+    @property
+    def TOURS_COUNT(self):
+        return self.engine.as_dict(self.engine.tours_count)
+
+    @property
+    def DOPS(self):
+        return self.engine.as_dict(self.engine.dops)
+
+    @property
+    def POINTS(self):
+        return self.engine.as_dict(self.engine.points)
+
+    @property
+    def history(self):
+        return self.engine.history()
+
+    def timeline(self, nick: str):
+        '''Хронология рейтинга игрока по сыгранным им сериям.'''
+        return self.engine.timeline(nick)
+
+    def rank_at(self, nick: str, k: int):
+        '''Место игрока в таблице после k-й серии сезона (с нуля).'''
+        return self.engine.rank_at(nick, k)
+
+    def rank(self, nick: str, finalists: bool = False):
+        '''Текущее место игрока в таблице (или среди финалистов).'''
+        return self.engine.rank(nick, FINAL_MIN_SERIES if finalists else 0)
+
+    def top(self, k: int, finalists: bool = False):
+        '''Первые k строк таблицы: ник, рейтинг, число серий, сумма допов, сумма баллов.'''
+        return self.engine.top(k, FINAL_MIN_SERIES if finalists else 0)
+
+    def final_chances(self, remaining: int, top: int = 10, scenarios: int = 100_000, processes: int = None):
+        '''Вероятность игроков попасть в первые top финалистов после remaining оставшихся серий (Монте-Карло).'''
+        return simulate_finalists(self.engine, remaining, top, scenarios, FINAL_MIN_SERIES, processes=processes)
+
+    @property
+    def current_rating(self):
+        return [
+            {
+                "nickname": nick,
+                "rating": ceil(rating),
+                "series_count": series_count
+            }
+            for nick, rating, series_count, _, _ in self.engine.standings()
+        ]
+
+    def _repr_html_(self):
+        result = [
+            {
+                "nickname": nick,
+                "rating": rating,
+                "series_count": series_count,
+                'total_dops' : dops,
+                'total_points' : points,
+                'avg_points' : points / series_count
+            }
+            for nick, rating, series_count, dops, points in self.engine.top(TOP)
+        ]
+        return render_html(result)
+
+
+def open_season(season_class, session: requests.Session, *args, **kwargs) -> SeasonBase:
+    '''
+    Функция открывает текущий сезон серии season_class.NAME с общим кэшем серий
+    и снимком в CACHE_DIR. args и kwargs - параметры сезона после номера (exclude, calculate, ...).
+    '''
+    season_id = current_season(session, season_class.MAIN_URL, season_class.NAME, season_class.parse_season)
+    return season_class(session, season_id, *args, cache=TournamentCache(season_class.NAMESPACE),
+                        snapshot_path=os.path.join(CACHE_DIR, f"{season_class.NAMESPACE}_{season_id}.pickle"),
+                        **kwargs)
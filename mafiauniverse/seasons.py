@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+import requests
+
+from mafiauniverse.cache import CACHE_DIR
+from mafiauniverse.profiling import span
+from mafiauniverse.search import search_series
+
+SEASONS_PATH = os.path.join(CACHE_DIR, "seasons.json")
+SEASON_TTL = 6 * 3600
+
+
+class SeasonDirectory():
+    '''
+    Кэш номеров текущих сезонов по названию серии турниров: с теплым кэшем расчет
+    сразу идет на страницу сезона, без запроса токена и поиска. Устаревший номер
+    отдается сразу, а поиск новейшего сезона повторяется в фоне.
+
+    Parameters
+    ----------
+    path : str
+        Файл JSON, в котором номера хранятся между запусками (None - только в памяти)
+    ttl : float
+        Сколько секунд номер сезона считается свежим
+    '''
+
+    def __init__(self, path: Optional[str] = SEASONS_PATH, ttl: float = SEASON_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._seasons: Dict[str, dict] = {}
+        self._refreshing: Dict[str, Future] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._seasons = json.load(f)
+            except (OSError, ValueError):
+                self._seasons = {}
+
+    def _start_refresh(self, name: str, resolve: Callable[[], int]) -> Future:
+        '''Запускает поиск сезона, если он еще не идет; все вызывающие ждут один и тот же поиск.'''
+        with self._lock:
+            if name in self._refreshing:
+                return self._refreshing[name]
+            future = self._refreshing[name] = Future()
+        threading.Thread(target=self._refresh, args=(name, resolve, future), daemon=True).start()
+        return future
+
+    def _refresh(self, name: str, resolve: Callable[[], int], future: Future):
+        try:
+            season = int(resolve())
+            with self._lock:
+                self._seasons[name] = {"season": season, "checked": time.time()}
+                data = dict(self._seasons)
+            self._save(data)
+        except BaseException as err:
+            future.set_exception(err)
+        else:
+            future.set_result(season)
+        finally:
+            with self._lock:
+                self._refreshing.pop(name, None)
+
+    def _save(self, data: dict):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def season(self, name: str, resolve: Callable[[], int]) -> int:
+        '''
+        Номер текущего сезона серии name. resolve ищет его на сайте и вызывается,
+        только если номера нет (тогда его ждут) или он устарел (тогда поиск идет в фоне).
+        '''
+        cached = self._seasons.get(name)
+        if cached is None:
+            return self._start_refresh(name, resolve).result()
+        if time.time() - cached["checked"] >= self.ttl:
+            self._start_refresh(name, resolve)
+        return cached["season"]
+
+    def invalidate(self, name: Optional[str] = None):
+        '''Забывает номер сезона name (None - все), следующий запрос пойдет в поиск.'''
+        with self._lock:
+            if name is None:
+                self._seasons.clear()
+            else:
+                self._seasons.pop(name, None)
+            data = dict(self._seasons)
+        self._save(data)
+
+
+_DIRECTORY: Optional[SeasonDirectory] = None
+_DIRECTORY_LOCK = threading.Lock()
+
+
+def default_directory() -> SeasonDirectory:
+    '''Общий для процесса кэш номеров сезонов, хранящийся рядом с кэшем серий.'''
+    global _DIRECTORY
+    with _DIRECTORY_LOCK:
+        if _DIRECTORY is None:
+            _DIRECTORY = SeasonDirectory()
+        return _DIRECTORY
+
+
+def current_season(session: requests.Session, main_url: str, name: str,
+                   parse_season: Callable[[bytes], Optional[int]]) -> int:
+    '''
+    Функция возвращает ссылочный номер текущего сезона серии name: из кэша сезонов
+    или поиском на сайте, parse_season находит номер на странице результатов поиска.
+    '''
+    def resolve():
+        response = search_series(session, main_url, name)
+        with span("parse_season"):
+            season = parse_season(response.content)
+        if season is None:
+            raise RuntimeError("Season number wasn't found")
+        return season
+    return default_directory().season(name, resolve)
@@ -0,0 +1,134 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional
+
+from mafiauniverse.players import normalize
+from mafiauniverse.render import RenderedStandings, StandingsRenderer
+
+TTL = 300
+STALE_TTL = 3600
+
+
+class RatingService():
+    '''
+    Долгоживущий сервис рейтинга: держит посчитанный current_rating в памяти
+    вместе с готовыми представлениями (RenderedStandings) и отвечает на запросы
+    по игрокам поиском, без пересчета сезона и форматирования.
+
+    Parameters
+    ----------
+    compute : Callable[[], list[dict]]
+        Функция расчета рейтинга (например, get_rating модуля)
+    ttl : float
+        Сколько секунд рейтинг считается свежим
+    stale_ttl : float
+        Сколько секунд можно отдавать устаревший рейтинг, пересчитывая его в фоне
+    '''
+
+    def __init__(self, compute: Callable[[], List[dict]], ttl: float = TTL, stale_ttl: float = STALE_TTL):
+        self.compute = compute
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._refreshing: Optional[Future] = None
+        self._rating: Optional[List[dict]] = None
+        self._renderer = StandingsRenderer(self.normalize)
+        self._rendered: Optional[RenderedStandings] = None
+        self._updated = 0.0
+
+    # тот же ключ ника, что и в реестре игроков: регистр и лишние пробелы не важны
+    normalize = staticmethod(normalize)
+
+    def _start_refresh(self) -> Future:
+        '''Запускает пересчет, если он еще не идет; все вызывающие ждут один и тот же пересчет.'''
+        with self._lock:
+            if self._refreshing is not None:
+                return self._refreshing
+            future = self._refreshing = Future()
+        threading.Thread(target=self._refresh, args=(future,), daemon=True).start()
+        return future
+
+    def _refresh(self, future: Future):
+        try:
+            rating = self.compute()
+            rendered = self._renderer.update(rating)
+            with self._lock:
+                self._rating, self._rendered, self._updated = rating, rendered, time.monotonic()
+        except BaseException as err:
+            future.set_exception(err)
+        else:
+            future.set_result(rating)
+        finally:
+            with self._lock:
+                self._refreshing = None
+
+    def refresh(self) -> List[dict]:
+        '''Пересчитывает рейтинг и ждет окончания пересчета.'''
+        return self._start_refresh().result()
+
+    def _ensure(self):
+        age = time.monotonic() - self._updated
+        if self._rating is None or age >= self.stale_ttl:
+            self._start_refresh().result()
+        elif age >= self.ttl:
+            self._start_refresh()
+
+    def rating(self) -> List[dict]:
+        self._ensure()
+        return self._rating
+
+    def rendered(self) -> RenderedStandings:
+        '''Готовые представления текущей версии рейтинга (таблица JSON, карточки, первые места).'''
+        self._ensure()
+        return self._rendered
+
+    def player(self, nickname: str) -> Optional[dict]:
+        '''Рейтинг и место игрока (ник без учета регистра) или None.'''
+        self._ensure()
+        data = self._rendered.players.get(self.normalize(nickname))
+        return data.copy() if data is not None else None
+
+    def card(self, nickname: str) -> Optional[str]:
+        '''Готовый текст карточки игрока (ник без учета регистра) или None.'''
+        self._ensure()
+        return self._rendered.cards.get(self.normalize(nickname))
+
+    def players(self, nicknames: Iterable[str]) -> Dict[str, Optional[dict]]:
+        self._ensure()
+        index = self._rendered.players
+        result = {}
+        for nickname in nicknames:
+            data = index.get(self.normalize(nickname))
+            result[nickname] = data.copy() if data is not None else None
+        return result
+
+
+class ExcludeServices():
+    '''
+    Общие для всех вызовов сервисы рейтинга модуля, в котором рейтинг зависит
+    от списка игроков вне зачета: один RatingService на каждый такой список.
+
+    Parameters
+    ----------
+    compute : Callable[[list[str]], list[dict]]
+        Функция расчета рейтинга по списку вне зачета (например, get_rating модуля)
+    '''
+
+    def __init__(self, compute: Callable[[List[str]], List[dict]]):
+        self.compute = compute
+        self._lock = threading.Lock()
+        self._services: Dict[tuple, RatingService] = {}
+
+    def __call__(self, exclude: Iterable[str]) -> RatingService:
+        key = tuple(sorted(exclude))
+        with self._lock:
+            if key not in self._services:
+                self._services[key] = RatingService(lambda: self.compute(list(key)))
+            return self._services[key]
+
+    def player(self, nickname: str, exclude: Iterable[str]) -> Optional[dict]:
+        return self(exclude).player(nickname)
+
+    def players(self, nicknames: Iterable[str], exclude: Iterable[str]) -> Dict[str, Optional[dict]]:
+        return self(exclude).players(nicknames)
@@ -0,0 +1,111 @@
+'''
+Монте-Карло прогноз выхода в финал: оставшиеся серии сезона разыгрываются пачками
+сценариев на массивах NumPy (сценарий x игрок) той же формулой, что и рейтинг.
+
+Исход серии - таблица одной из уже сыгранных серий сезона (места, баллы, допы, победы
+и игры по строкам), строки которой достаются случайным игрокам. Игрок попадает в серию
+с вероятностью, пропорциональной доле сыгранных им серий, новые игроки не моделируются.
+'''
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from mafiauniverse.engine import FINAL_MIN_SERIES, RatingEngine, SeriesArrays
+
+BATCH = 20000
+PERMUTATIONS = 4096
+
+
+class SeriesTemplate(NamedTuple):
+    '''Столбцы таблицы сыгранной серии в порядке строк.'''
+    place: np.ndarray
+    points: np.ndarray
+    dops: np.ndarray
+    wins: np.ndarray
+    games: np.ndarray
+
+
+def series_templates(engine: RatingEngine) -> List[SeriesTemplate]:
+    '''Функция достает таблицы сыгранных серий из истории расчета.'''
+    columns = engine.log.columns
+    if not len(columns['series']):
+        raise RuntimeError("No played series to sample from")
+    bounds = np.flatnonzero(np.diff(columns['series'])) + 1
+    split = {
+        name: np.split(columns[name].astype(dtype), bounds)
+        for name, dtype in (('place', np.int64), ('points', np.float64), ('dops', np.float64),
+                            ('wins', np.int64), ('games', np.int64))
+    }
+    return [SeriesTemplate(*(split[name][i] for name in SeriesTemplate._fields)) for i in range(len(bounds) + 1)]
+
+
+def simulate_hits(rating: np.ndarray, tours: np.ndarray, weights: np.ndarray, templates: List[SeriesTemplate],
+                  formula: Callable, remaining: int, top: int, min_series: int, scenarios: int,
+                  seed=None) -> np.ndarray:
+    '''Функция разыгрывает scenarios сценариев и возвращает, сколько раз каждый игрок попал в первые top финалистов.'''
+    rng = np.random.default_rng(seed)
+    players = len(rating)
+    weights = weights.astype(np.float32)
+    # случайные перестановки строк таблицы, общие для всех сценариев одного запуска
+    permutations = {}
+    for template in templates:
+        size = min(len(template.place), players)
+        if size not in permutations:
+            permutations[size] = rng.random((PERMUTATIONS, size), dtype=np.float32).argsort(axis=1)
+    hits = np.zeros(players, dtype=np.int64)
+    for start in range(0, scenarios, BATCH):
+        n = min(BATCH, scenarios - start)
+        ratings = np.repeat(rating[None, :], n, axis=0)
+        counts = np.repeat(tours[None, :], n, axis=0)
+        flat_ratings, flat_counts = ratings.reshape(-1), counts.reshape(-1)
+        for _ in range(remaining):
+            choice = rng.integers(len(templates), size=n)
+            groups = np.split(np.argsort(choice, kind='stable'), np.cumsum(np.bincount(choice))[:-1])
+            for template, rows in zip(templates, groups):
+                if not len(rows):
+                    continue
+                rows = rows[:, None]
+                size = min(len(template.place), players)
+                # выборка без возвращения с весами (наименьшие E/w, E ~ Exp(1)), затем случайная раздача строк
+                keys = rng.standard_exponential(size=(len(rows), players), dtype=np.float32) / weights
+                ids = np.argpartition(keys, size - 1, axis=1)[:, :size]
+                shuffle = permutations[size][rng.integers(PERMUTATIONS, size=len(rows))]
+                ids = np.take_along_axis(ids, shuffle, axis=1)
+                cells = rows * players + ids
+                before = flat_ratings[cells]
+                series = SeriesArrays(0, ids, *(column[:size] for column in template))
+                delta, _ = formula(before, series)
+                flat_ratings[cells] = before + delta
+                flat_counts[cells] += 1
+        eligible = counts >= min_series
+        k = min(top, players)
+        best = np.argpartition(-np.where(eligible, ratings, -np.inf), k - 1, axis=1)[:, :k]
+        qualified = np.take_along_axis(eligible, best, axis=1)
+        hits += np.bincount(best[qualified], minlength=players)
+    return hits
+
+
+def simulate_finalists(engine: RatingEngine, remaining: int, top: int = 10, scenarios: int = 100_000,
+                       min_series: int = FINAL_MIN_SERIES, seed=None,
+                       processes: Optional[int] = None) -> Dict[str, float]:
+    '''
+    Функция оценивает вероятность каждого игрока оказаться в первых top финалистах
+    (не меньше min_series серий) после remaining оставшихся серий.
+    processes - число процессов, между которыми делятся сценарии (None - в текущем процессе).
+    Игроки упорядочены по убыванию вероятности.
+    '''
+    players = len(engine)
+    rating = engine.rating[:players].copy()
+    tours = engine.tours_count[:players].copy()
+    args = (rating, tours, tours / len(engine.log), series_templates(engine), engine.formula,
+            remaining, top, min_series)
+    seeds = np.random.SeedSequence(seed).spawn(processes or 1)
+    sizes = [len(part) for part in np.array_split(np.arange(scenarios), len(seeds))]
+    if processes:
+        with ProcessPoolExecutor(processes) as pool:
+            hits = sum(pool.map(simulate_hits, *zip(*[args] * len(seeds)), sizes, seeds))
+    else:
+        hits = simulate_hits(*args, scenarios, seeds[0])
+    probabilities = hits / scenarios
+    return {engine.nicknames[i]: float(probabilities[i]) for i in np.argsort(-probabilities, kind='stable')}
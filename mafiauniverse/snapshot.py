@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from mafiauniverse.engine import RatingEngine
+
+SNAPSHOT_VERSION = 8
+
+
+def series_digest(rows: Any) -> str:
+    '''Отпечаток распарсенных результатов серии, по которому видны правки задним числом.'''
+    return hashlib.sha1(json.dumps(rows, ensure_ascii=False).encode()).hexdigest()
+
+
+@dataclass
+class SeasonSnapshot:
+    '''
+    Состояние сезона после свертки всех завершенных серий.
+
+    Parameters
+    ----------
+    params : dict
+        Параметры расчета (номер сезона, список вне зачета), при их смене нужен полный пересчет
+    links : list[str]
+        Свернутые серии в порядке свертки
+    digests : list[str]
+        Отпечатки результатов свернутых серий
+    engine : RatingEngine
+        Рейтинг сезона после свернутых серий
+    validated : float
+        Когда результаты свернутых серий последний раз сверялись с сайтом (time.time())
+    '''
+    params: Dict[str, Any]
+    links: List[str]
+    digests: List[str]
+    engine: RatingEngine
+    validated: float = 0.0
+    version: int = SNAPSHOT_VERSION
+
+    @classmethod
+    def capture(cls, season, params: Dict[str, Any], links: List[str], digests: List[str], validated: float):
+        return cls(params, list(links), list(digests), season.engine.copy(), validated)
+
+    def restore(self, season) -> bool:
+        '''
+        Возвращает сезон к сохраненному состоянию с текущим реестром игроков.
+        False - игроки снимка не сопоставляются реестру, нужен полный пересчет.
+        '''
+        engine = self.engine.copy()
+        if not engine.attach(season.engine.registry):
+            return False
+        season.engine = engine
+        return True
+
+    def resume_index(self, params: Dict[str, Any], links: List[str], open_links: int = 1) -> Optional[int]:
+        '''
+        Функция возвращает индекс первой несвернутой серии или None, если нужен полный пересчет:
+        сменились параметры или список уже свернутых серий на странице сезона, или в снимок
+        попала одна из последних open_links серий, которые могут еще играться.
+        Результаты свернутых серий здесь не проверяются, их сверяет с сайтом changed.
+        '''
+        if params != self.params or links[:len(self.links)] != self.links or len(self.links) > len(links) - open_links:
+            return None
+        return len(self.links)
+
+    def changed(self, results: List[Any]) -> List[int]:
+        '''Функция возвращает индексы свернутых серий, свежие результаты которых не совпадают с отпечатками.'''
+        return [i for i, (rows, digest) in enumerate(zip(results, self.digests)) if series_digest(rows) != digest]
+
+
+def load_snapshot(path: str) -> Optional[SeasonSnapshot]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(snapshot, SeasonSnapshot) or getattr(snapshot, "version", None) != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def save_snapshot(path: str, snapshot: SeasonSnapshot):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # свой временный файл у каждого писателя: сезон одновременно сохраняют сервис рейтинга и наблюдатель
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(snapshot, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
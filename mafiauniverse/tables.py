@@ -0,0 +1,104 @@
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+NUMBER = re.compile(r"[0-9]+")
+RESULT_ROWS = '//table[@id="TournResultsTable"]'
+CLASS_LINKS = '//a[contains(concat(" ", normalize-space(@class), " "), " {} ")]'
+TABLE = re.compile(r"\s*стол\s*[0-9]+", re.IGNORECASE)
+
+
+class ResultRow(NamedTuple):
+    place: int
+    nick: str
+    points: float
+    dops: float
+    wins: int
+    games: int
+
+
+@lru_cache(maxsize=None)
+def _html_parser():
+    from lxml import html
+
+    return html.HTMLParser(encoding="utf-8")
+
+
+def parse_html(html_content: bytes):
+    '''Разбор страницы через lxml (lxml импортируется при первом разборе, а не при импорте модуля).'''
+    from lxml import html
+
+    return html.document_fromstring(html_content, parser=_html_parser())
+
+
+def extract_links(html_content: bytes, class_name: Optional[str] = None) -> List[Tuple[str, str]]:
+    '''Функция возвращает ссылки страницы (href, текст) в порядке появления, при class_name - только с этим классом.'''
+    tree = parse_html(html_content)
+    links = tree.xpath(CLASS_LINKS.format(class_name)) if class_name else tree.iter("a")
+    return [(a_link.get("href"), a_link.text_content()) for a_link in links]
+
+
+def count_open_links(html_content: bytes, links: List[str]) -> int:
+    '''
+    Функция считает последние из ссылок сезона links, которые могут еще играться: все столы последней серии
+    ("серия 5 стол 1" и "серия 5 стол 2" - разные ссылки, текст которых без номера стола совпадает).
+    '''
+    if not links:
+        return 0
+    titles = dict(extract_links(html_content, "fw-bold"))
+
+    def series(link: str) -> str:
+        return TABLE.sub("", titles.get(link) or "").strip()
+
+    last = series(links[-1])
+    count = 1
+    while last and count < len(links) and series(links[-count - 1]) == last:
+        count += 1
+    return count
+
+
+def _to_float(text: str) -> float:
+    return float(text.replace(',', '.'))
+
+
+def extract_results_cells(html_content: bytes) -> Tuple[Optional[str], Optional[List[List[str]]]]:
+    '''
+    Функция достает заголовок страницы и текст ячеек строк TournResultsTable.
+    Если таблицы нет, вместо строк возвращается None.
+    '''
+    tree = parse_html(html_content)
+    title = tree.findtext(".//title")
+    tables = tree.xpath(RESULT_ROWS)
+    if not tables:
+        return title, None
+    rows = [
+        [td.text_content().strip() for td in tr.iterchildren("td")]
+        for tr in tables[0].iterfind("tbody/tr")
+    ]
+    return title, rows
+
+
+def parse_result_row(cells: List[str], games: bool = True) -> ResultRow:
+    '''
+    Функция переводит ячейки строки результатов в типизированный кортеж.
+    Без колонки побед/игр (десятая ячейка "победы / игры") строка с games=True - ошибка:
+    формула Энтропии делит на число игр. С games=False колонка не нужна, победы и игры - нули.
+    '''
+    wins = games_count = 0
+    numbers = NUMBER.findall(cells[9]) if len(cells) > 9 else []
+    if len(numbers) >= 2:
+        wins, games_count = int(numbers[0]), int(numbers[1])
+    elif games:
+        raise RuntimeError(f"Row without wins/games column: {cells}")
+    return ResultRow(int(cells[0]), cells[1], _to_float(cells[2]), _to_float(cells[3]), wins, games_count)
+
+
+def extract_results(html_content: bytes, games: bool = True) -> Tuple[Optional[str], List[ResultRow]]:
+    '''
+    Функция находит TournResultsTable и возвращает заголовок страницы и строки результатов.
+    games=False - колонка побед/игр не обязательна (для формул, которые ее не используют).
+    '''
+    title, rows = extract_results_cells(html_content)
+    if rows is None:
+        raise RuntimeError("Results table wasn't found")
+    return title, [parse_result_row(cells, games) for cells in rows]
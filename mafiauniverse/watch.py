@@ -0,0 +1,187 @@
+'''
+Наблюдение за текущим сезоном вместо повторных вызовов get_rating: каждая проверка
+скачивает только страницу сезона и страницу открытой серии и сравнивает их отпечаток
+с предыдущим. Свертка сезона и подписчики запускаются, только если отпечаток изменился.
+Интервал проверок сокращается в игровые вечера и после изменений и растет, пока изменений нет.
+Игровые дни у каждой серии турниров свои, поэтому их задает вызывающий.
+'''
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+import requests
+
+from mafiauniverse.profiling import span
+from mafiauniverse.snapshot import series_digest
+
+MIN_INTERVAL = 60
+GAME_INTERVAL = 120
+MAX_INTERVAL = 3600
+BACKOFF = 2.0
+GAME_HOURS = range(18, 24)
+
+
+@dataclass(frozen=True)
+class RatingChange:
+    '''
+    Изменение строки таблицы игрока (None - игрока не было в таблице до или после).
+    '''
+    nickname: str
+    place_before: Optional[int]
+    place: Optional[int]
+    rating_before: Optional[float]
+    rating: Optional[float]
+
+    @property
+    def moved(self) -> int:
+        '''На сколько мест игрок поднялся (отрицательное - опустился).'''
+        if self.place_before is None or self.place is None:
+            return 0
+        return self.place_before - self.place
+
+    @property
+    def delta(self) -> float:
+        return (self.rating or 0.0) - (self.rating_before or 0.0)
+
+
+def rating_diff(before: Iterable[tuple], after: Iterable[tuple]) -> List[RatingChange]:
+    '''Функция сравнивает две таблицы (строки standings) и возвращает изменившиеся строки по новому месту.'''
+    old = {row[0]: (place, row[1]) for place, row in enumerate(before, start=1)}
+    changes = []
+    for place, row in enumerate(after, start=1):
+        place_before, rating_before = old.pop(row[0], (None, None))
+        if place_before != place or rating_before != row[1]:
+            changes.append(RatingChange(row[0], place_before, place, rating_before, row[1]))
+    for nick, (place_before, rating_before) in old.items():
+        changes.append(RatingChange(nick, place_before, None, rating_before, None))
+    return changes
+
+
+class SeasonWatcher():
+    '''
+    Наблюдатель за сезоном: пересчитывает рейтинг при изменении страниц сезона
+    и передает подписчикам список изменений RatingChange.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Сессия для запросов к сайту
+    season : SeasonBase
+        Посчитанный сезон (entropy или magistraytik), досчитывается через refresh
+    game_days : Iterable[int]
+        Дни недели, в которые играются серии (0 - понедельник)
+    min_interval, game_interval, max_interval : float
+        Интервал после изменения, наибольший интервал в игровое время и вне его, с
+    game_hours : Iterable[int]
+        Часы местного времени, в которые в игровые дни идут серии
+    '''
+
+    def __init__(self, session: requests.Session, season, game_days: Iterable[int], min_interval: float = MIN_INTERVAL, game_interval: float = GAME_INTERVAL,
+                 max_interval: float = MAX_INTERVAL, backoff: float = BACKOFF, game_hours: Iterable[int] = GAME_HOURS):
+        self.session = session
+        self.season = season
+        self.min_interval = min_interval
+        self.game_interval = game_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.game_days = frozenset(game_days)
+        self.game_hours = frozenset(game_hours)
+        self.interval = min_interval
+        self.fingerprint: Optional[str] = None
+        self.last_error: Optional[BaseException] = None
+        self._standings = season.engine.standings()
+        self._callbacks: List[Callable[[List[RatingChange], Any], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: Callable[[List[RatingChange], Any], None]) -> Callable:
+        '''Подписывает callback(changes, season) на изменения рейтинга, годится как декоратор.'''
+        self._callbacks.append(callback)
+        return callback
+
+    def check(self) -> Tuple[str, List[str], List[Any]]:
+        '''
+        Функция скачивает страницу сезона и открытых серий (всех столов последней серии) и возвращает
+        их отпечаток, ссылки на серии и разобранные результаты открытых серий.
+        '''
+        with span("watch_check"):
+            links = self.season.read_links(self.session)
+            open_results = [
+                self.season.parse_tour_results(self.session.get(f"{self.season.MAIN_URL}{link}").content)
+                for link in links[-self.season.open_links:]
+            ]
+        fingerprint = hashlib.sha1(json.dumps(
+            [links, [series_digest(result) for result in open_results]], ensure_ascii=False,
+        ).encode()).hexdigest()
+        return fingerprint, links, open_results
+
+    def poll(self) -> Optional[List[RatingChange]]:
+        '''
+        Одна проверка сезона. Если отпечаток изменился - досчитывает рейтинг, вызывает подписчиков
+        и возвращает изменения, иначе None. Первая проверка всегда досчитывает сезон:
+        страницы могли измениться после его расчета.
+        '''
+        fingerprint, links, open_results = self.check()
+        first = self.fingerprint is None
+        changed = fingerprint != self.fingerprint
+        self.fingerprint = fingerprint
+        self.interval = self.next_interval(changed and not first)
+        if not changed:
+            return None
+        # открытые серии уже скачаны проверкой, refresh их не перечитывает
+        self.season.refresh(self.session, links, open_results)
+        standings = self.season.engine.standings()
+        changes = rating_diff(self._standings, standings)
+        self._standings = standings
+        if changes:
+            for callback in self._callbacks:
+                callback(changes, self.season)
+        return changes
+
+    def is_game_time(self, now: datetime) -> bool:
+        return now.weekday() in self.game_days and now.hour in self.game_hours
+
+    def next_interval(self, changed: bool, now: Optional[datetime] = None) -> float:
+        '''Интервал до следующей проверки: сразу после изменения - наименьший, без изменений растет.'''
+        if changed:
+            return self.min_interval
+        limit = self.game_interval if self.is_game_time(now or datetime.now()) else self.max_interval
+        return min(max(self.interval * self.backoff, self.min_interval), limit)
+
+    def run(self):
+        '''Проверяет сезон до вызова stop. Ошибки сети не прерывают наблюдение, а увеличивают интервал.'''
+        while not self._stop.is_set():
+            try:
+                self.poll()
+                self.last_error = None
+            except Exception as err:
+                self.last_error = err
+                self.interval = self.next_interval(False)
+            deadline = time.monotonic() + self.interval
+            while not self._stop.is_set():
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                if self.interval > self.game_interval and self.is_game_time(datetime.now()):
+                    # начался игровой вечер: длинный интервал, выбранный днем, сокращается
+                    self.interval = self.game_interval
+                    deadline = min(deadline, time.monotonic() + self.game_interval)
+                    continue
+                self._stop.wait(min(left, self.game_interval))
+
+    def start(self) -> "SeasonWatcher":
+        '''Запускает наблюдение в фоновом потоке.'''
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
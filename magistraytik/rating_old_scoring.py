@@ -1,171 +1,130 @@
-import random
 import re
-import string
-from collections import defaultdict
-from dataclasses import dataclass, field
-from typing import List, Dict, Union
-import datetime
+from typing import Dict, FrozenSet, List, Optional, Union
 
 import requests
-from bs4 import BeautifulSoup
-from lxml import etree
-from requests_toolbelt import MultipartEncoder
+
+from mafiauniverse.cache import TournamentCache, load_series
+from mafiauniverse.engine import OldMagistraytikFormula, RatingEngine
+from mafiauniverse.players import PlayerRegistry, default_registry
+from mafiauniverse.profiling import span, traced
+from mafiauniverse.search import search_series
+from mafiauniverse import seasons
+from mafiauniverse.service import ExcludeServices, RatingService
+from mafiauniverse.tables import count_open_links, extract_links, extract_results_cells
+from scraping.transport import default_transport
 
 MAGISTREJTIK_NUMBER = re.compile(r"Магистрейтик ([0-9]+) сезон")
 NUMBER = re.compile(r"[0-9]+")
 MAIN_URL = "https://mafiauniverse.org"
 VALID_SERIES = re.compile(r"серия [0-9]+ | стол [0-9]")
-NICKNAME_AND_MVP = re.compile(r"(\w+ ?\w*)[\n\r\s]+[0-9,\-]+[\n\r\s]+([0-9,\-]+)")
-
-NICKNAMES = {}
-
-@dataclass
-class Series:
-    places: List[str]
-    points: List[int]
-    dops_sum: float = field(init=False)
-    
-    def __post_init__(self):
-        self.dops_sum = sum(i for i in self.points if i > 0)
-
+NICKNAME = re.compile(r"\w+ ?\w*")
+ADDITIONAL_BALL = re.compile(r"[0-9,\-]+")
+TOP_DISTRIBUTION = {
+    1: 0.50,
+    2: 0.33,
+    3: 0.17
+}
+DOPS_SHARE = 0.5
+NAMESPACE = "magistraytik_old"
 
 def parse_season(html_content: bytes):
-    soup = BeautifulSoup(html_content, "html.parser")
     max_season_number = 0
     html_link = ""
-    for a_link in soup.find_all("a"):
-        season_number = MAGISTREJTIK_NUMBER.findall(a_link.text)
+    for href, text in extract_links(html_content):
+        season_number = MAGISTREJTIK_NUMBER.findall(text)
         if season_number:
             season_num = int(season_number[0])
             if season_num > max_season_number:
                 max_season_number = season_num
-                html_link = a_link["href"]
+                html_link = href or ""
     series_number = NUMBER.findall(html_link)
     return series_number[0] if series_number else None
 
 
 def get_series(session: requests.Session):
-    
-    token_request = session.get(F"{MAIN_URL}/SerieOfTournaments/")
-    parser = etree.HTMLParser()
-    tree = etree.fromstring(token_request.text, parser)
-    verificationToken = tree.xpath(
-        '//form//input[@name="__RequestVerificationToken"]/@value'
-    )[0]
-    session_cookies = token_request.cookies
-    fields = {
-        "Page": "1",
-        "Year": str(datetime.now().year),
-        "searchText": "Магистрейтик",
-        "PageSize": "25",
-    }
-    boundary = "----WebKitFormBoundary" + "".join(
-        random.sample(string.ascii_letters + string.digits, 16)
-    )
-    m = MultipartEncoder(fields=fields, boundary=boundary)
-    headers = {
-        "requestverificationtoken": str(verificationToken),
-        "Content-Type": m.content_type,
-    }
-    return session.post(
-        f"{MAIN_URL}/SerieOfTournaments/Search",
-        cookies=session_cookies,
-        headers=headers,
-        data=m,
-    )
+    '''функция делает HTTP-запрос к веб-серверу для получения данных о сыгранных сериях в сезоне. '''
+    return search_series(session, MAIN_URL, "Магистрейтик")
+
+
+def current_season(session: requests.Session) -> int:
+    '''Функция возвращает ссылочный номер текущего сезона: из кэша сезонов или поиском на сайте.'''
+    return seasons.current_season(session, MAIN_URL, "Магистрейтик", parse_season)
 
 
 def parse_tournament_links(html_content: bytes) -> List[str]:
-    soup = BeautifulSoup(html_content, "html.parser")
     links = [
-        item["href"]
-        for item in soup.find_all("a", class_="fw-bold")
-        if VALID_SERIES.search(item.text)
+        href
+        for href, text in extract_links(html_content, "fw-bold")
+        if VALID_SERIES.search(text)
     ]
     links.reverse()
     return links
 
 
-def parse_series(result_table, exclude: List[str]) -> Series:
-    places = []
-    points = []
-    for tr in result_table.find_all("tr"):
-        tds = tr.find_all("td")
+def parse_series_rows(html_content: bytes) -> List[list]:
+    _, cells = extract_results_cells(html_content)
+    if cells is None:
+        raise RuntimeError("Results table wasn't found")
+    rows = []
+    for tds in cells:
         if not tds:
             continue
-        nickname_real = re.findall(r"\w+ ?\w*", tds[1].text)[0].rstrip(" ")
-        nickname = nickname_real.lower()
-        NICKNAMES[nickname] = nickname_real
-        if nickname in exclude:
-            continue
-        else:
-            places.append(nickname)
-            additional_ball = float(re.findall(r"[0-9,\-]+", tds[3].text)[0].replace(",", "."))
-            points.append(additional_ball)
-
-    return Series(places, points)
-
-
-def calculate_rating(series: List[Series], exclude: list[str]):
-    rating = {}
-    series_count = {}
-    for item in series:
-        total = 25
-        for player in item.places:
-            rating[player] = rating.get(player, 100)
-            total += rating[player] * 0.1
-            rating[player] -= rating[player] * 0.1
-            series_count[player] = series_count.get(player, 0) + 1
-        if item.dops_sum <= 0:
-            tops_distribution = 1
-        else:
-            tops_distribution = 0.5
-        dops_distribution = 1 - tops_distribution
-        rating[item.places[0]] += tops_distribution * total * 0.50
-        rating[item.places[1]] += tops_distribution * total * 0.33
-        rating[item.places[2]] += tops_distribution * total * 0.17
-        
-        for i, player in enumerate(item.places):
-            if item.points[i] > 0 :
-                rating[player] += item.points[i]/item.dops_sum * dops_distribution * total
-        # with open('file.txt', 'a', encoding='utf-8') as f:
-        #     print(sum(rating.values()), file=f)
-        #     for player in rating:
-        #         print(player, rating[player], file=f)
-        #     print('\n', file=f)
-    data = {
-        name: {"points": rating[name], "series count": series_count[name]}
-        for name in rating
-        if name not in exclude
+        nickname_real = NICKNAME.findall(tds[1])[0].rstrip(" ")
+        additional_ball = float(ADDITIONAL_BALL.findall(tds[3])[0].replace(",", "."))
+        rows.append([nickname_real, additional_ball])
+    return rows
+
+
+def fold_series(series_rows: List[List[list]], exclude: FrozenSet[int],
+                registry: Optional[PlayerRegistry] = None) -> RatingEngine:
+    '''
+    Функция сворачивает серии (строки ник, доп. балл в порядке мест) формулой старого рейтинга,
+    отбрасывая игроков вне зачета (номера реестра).
+    '''
+    registry = registry if registry is not None else default_registry()
+    engine = RatingEngine(OldMagistraytikFormula(TOP_DISTRIBUTION, DOPS_SHARE), registry=registry)
+    for tour, rows in enumerate(series_rows, start=1):
+        rows = [row for row in rows if registry.id(row[0]) not in exclude]
+        if rows:
+            engine.apply_series(
+                tour,
+                nicks=[row[0] for row in rows],
+                place=range(1, len(rows) + 1),
+                points=[0.0] * len(rows),
+                dops=[row[1] for row in rows],
+            )
+    return engine
+
+
+def calculate_season(session: requests.Session, html_content: bytes, exclude: FrozenSet[int],
+                     registry: Optional[PlayerRegistry] = None) -> RatingEngine:
+    '''Функция сворачивает по старым правилам серии сезона со страницы сезона html_content.'''
+    links = parse_tournament_links(html_content)
+    if not links:
+        raise RuntimeError("Tournaments weren't found")
+    series_rows = load_series(session, MAIN_URL, links, parse_series_rows, TournamentCache(NAMESPACE),
+                              open_links=count_open_links(html_content, links))
+    with span("fold", series=len(series_rows)):
+        return fold_series(series_rows, exclude, registry)
+
+
+def real_rating(engine: RatingEngine) -> Dict[str, Dict[str, Union[int, float]]]:
+    return {
+        nick: {"points": rating, "series count": series_count}
+        for nick, rating, series_count, _, _ in engine.standings()
     }
-    return data
 
 
 def get_real_rating(exclude: list[str]) -> Dict[str, Dict[str, Union[int, float]]]:
-    exclude = [item.lower() for item in exclude]
-    session = requests.Session()
-    response = get_series(session)
-    series_number = parse_season(response.content)
-    if series_number is None:
-        raise RuntimeError("Season number wasn't found")
-    series_url = f"{MAIN_URL}/SerieOfTournament/Tournaments/{series_number}"
-    response = session.get(series_url)
-    links = parse_tournament_links(response.content)
-    if not links:
-        raise RuntimeError("Tournaments weren't found")
-    series = []
-    for link in links:
-        tournament_link = f"{MAIN_URL}{link}"
-        response = session.get(tournament_link)
-        soup = BeautifulSoup(response.content, "html.parser")
-        result_table = soup.find("table", {"id": "TournResultsTable"})
-        if not result_table.find('tbody').text == '\n':
-            series.append(parse_series(result_table, exclude))
-    rating = calculate_rating(series, exclude)
-    rating = dict(
-        sorted(rating.items(), key=lambda item: item[1]["points"], reverse=True)
-    )
-    return rating
+    registry = default_registry()
+    session = default_transport()
+    series_number = current_season(session)
+    with span("tournament_links"):
+        series_url = f"{MAIN_URL}/SerieOfTournament/Tournaments/{series_number}"
+        response = session.get(series_url)
+    engine = calculate_season(session, response.content, registry.exclusion(exclude), registry)
+    registry.save()
+    return real_rating(engine)
 
 
 def math_round(number: float) -> int:
@@ -176,23 +135,35 @@ def math_round(number: float) -> int:
     return main_part
 
 
-def get_rating(exclude: list[str]) -> list[dict[str, str]]:
-    real_rating = get_real_rating(exclude)
-    rating = [
+def rating_rows(real_rating: Dict[str, Dict[str, Union[int, float]]]) -> list[dict[str, str]]:
+    '''Функция переводит рейтинг в строки ответа бота: рейтинг округлен math_round.'''
+    return [
         {
-            'nickname': NICKNAMES[nick],
+            'nickname': nick,
             'rating': str(math_round(data['points'])),
             'series_count': str(data['series count'])
         }
         for nick, data in real_rating.items()
     ]
-    return rating
+
+
+@traced("magistraytik_old.get_rating")
+def get_rating(exclude: list[str]) -> list[dict[str, str]]:
+    return rating_rows(get_real_rating(exclude))
+
+
+RATING_SERVICES = ExcludeServices(get_rating)
+
+
+def rating_service(exclude: List[str]) -> RatingService:
+    '''Общий для всех вызовов сервис рейтинга с данным списком игроков вне зачета.'''
+    return RATING_SERVICES(exclude)
 
 
 def get_player_rating(player: str, exclude: List[str]) -> dict[str, str]:
-    rating = get_rating(exclude)
-    for place, player_data in enumerate(rating, start=1):
-        if player_data['nickname'] == player:
-            data = player_data.copy()
-            data['place'] = place
-            return data
+    '''Рейтинг и место игрока из кэшированного рейтинга (ник без учета регистра).'''
+    return RATING_SERVICES.player(player, exclude)
+
+
+def get_players_rating(players: List[str], exclude: List[str]) -> Dict[str, dict[str, str]]:
+    return RATING_SERVICES.players(players, exclude)
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_SIZE = 16
+RETRIES = 3
+BACKOFF = 0.5
+TIMEOUT = 20
+TOKEN_TTL = 600
+RETRY_STATUSES = (500, 502, 503, 504)
+# запросов в секунду и размер пачки для каждого сайта
+RATE_LIMITS = {
+    "mafiauniverse.org": (10.0, 10),
+    "gomafia.pro": (5.0, 5),
+}
+
+
+class TokenBucket():
+    '''
+    Ограничитель частоты запросов: не больше rate запросов в секунду,
+    пачкой не больше burst запросов.
+    '''
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class TransportMetrics():
+    '''Счетчики запросов по сайтам: число запросов, ошибок, байт и время ответа.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._hosts = defaultdict(lambda: {
+                "requests": 0, "errors": 0, "bytes": 0, "latency_sum": 0.0, "latency_max": 0.0,
+            })
+
+    def add(self, host: str, latency: float, size: int = 0, error: bool = False):
+        with self._lock:
+            counters = self._hosts[host]
+            counters["requests"] += 1
+            counters["errors"] += int(error)
+            counters["bytes"] += size
+            counters["latency_sum"] += latency
+            counters["latency_max"] = max(counters["latency_max"], latency)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            result = {}
+            for host, counters in self._hosts.items():
+                counters = dict(counters)
+                counters["latency_avg"] = counters["latency_sum"] / counters["requests"] if counters["requests"] else 0.0
+                result[host] = counters
+            return result
+
+
+class Transport(requests.Session):
+    '''
+    Общая HTTP-сессия для всех парсеров: пул keep-alive соединений, повторы
+    с нарастающей паузой при 5xx и таймаутах, ограничение частоты по сайтам,
+    повторное использование токенов форм и счетчики запросов.
+
+    Parameters
+    ----------
+    pool_size : int
+        Размер пула соединений на сайт
+    retries : int
+        Число повторов запроса
+    backoff : float
+        Множитель паузы между повторами, с
+    timeout : float
+        Таймаут запроса по умолчанию, с
+    rate_limits : dict[str, tuple[float, int]]
+        Ограничения частоты по сайтам (запросов в секунду, размер пачки)
+    '''
+
+    def __init__(self, pool_size: int = POOL_SIZE, retries: int = RETRIES, backoff: float = BACKOFF,
+                 timeout: float = TIMEOUT, rate_limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        super().__init__()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.timeout = timeout
+        self.metrics = TransportMetrics()
+        self._limiters = {
+            host: TokenBucket(rate, burst)
+            for host, (rate, burst) in (RATE_LIMITS if rate_limits is None else rate_limits).items()
+        }
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._tokens_lock = threading.Lock()
+
+    def _limiter(self, host: str) -> Optional[TokenBucket]:
+        for limited_host, limiter in self._limiters.items():
+            if host == limited_host or host.endswith(f".{limited_host}"):
+                return limiter
+        return None
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).hostname or ""
+        limiter = self._limiter(host)
+        if limiter is not None:
+            limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.RequestException:
+            self.metrics.add(host, time.perf_counter() - start, error=True)
+            raise
+        size = len(response.content) if not kwargs.get("stream") else 0
+        self.metrics.add(host, time.perf_counter() - start, size, error=response.status_code >= 400)
+        return response
+
+    def form_token(self, url: str, parse: Callable[[requests.Response], str], ttl: float = TOKEN_TTL) -> str:
+        '''
+        Токен формы со страницы url. Токен и cookies сессии переиспользуются ttl секунд,
+        поэтому страница с формой не запрашивается перед каждой отправкой формы.
+        '''
+        with self._tokens_lock:
+            cached = self._tokens.get(url)
+            if cached is not None and time.monotonic() - cached[1] < ttl:
+                return cached[0]
+        token = parse(self.get(url))
+        with self._tokens_lock:
+            self._tokens[url] = (token, time.monotonic())
+        return token
+
+    def forget_token(self, url: str):
+        with self._tokens_lock:
+            self._tokens.pop(url, None)
+
+
+_TRANSPORT: Optional[Transport] = None
+_TRANSPORT_LOCK = threading.Lock()
+
+
+def default_transport() -> Transport:
+    '''Общая для процесса сессия, чтобы соединения и токены жили между запросами бота.'''
+    global _TRANSPORT
+    with _TRANSPORT_LOCK:
+        if _TRANSPORT is None:
+            _TRANSPORT = Transport()
+        return _TRANSPORT
@@ -0,0 +1,50 @@
+'''
+Кэш серий: столы последней серии (они могут еще играться) не берутся из кэша и не попадают в него,
+а их копия, попавшая в кэш раньше, удаляется, чтобы после завершения серия скачалась заново.
+
+    python -m pytest -q tests
+'''
+from mafiauniverse.cache import TournamentCache, load_series
+from mafiauniverse.tables import count_open_links
+
+SEASON_PAGE = "".join(
+    f'<a class="fw-bold" href="/Tournament/{href}">Магистрейтик 5 сезон {title}</a>'
+    for href, title in [(4, "серия 2 стол 2"), (3, "серия 2 стол 1"), (2, "серия 1 стол 2"), (1, "серия 1 стол 1")]
+).encode()
+LINKS = ["/Tournament/1", "/Tournament/2", "/Tournament/3", "/Tournament/4"]
+
+
+class Page():
+    def __init__(self, content: bytes):
+        self.content = content
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+class Site():
+    def __init__(self):
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url.rsplit("/", 1)[1])
+        return Page(url.rsplit("/", 1)[1].encode())
+
+
+def test_open_tables_are_not_cached(tmp_path):
+    assert count_open_links(SEASON_PAGE, LINKS) == 2
+    assert count_open_links(SEASON_PAGE, LINKS[:3]) == 1
+
+    cache = TournamentCache("test", str(tmp_path / "cache.sqlite"))
+    # первый стол последней серии закэширован, пока второй еще игрался
+    cache.put("/Tournament/3", "partial")
+    site = Site()
+    results = load_series(site, "", LINKS, lambda content: content.decode(), cache, max_workers=1, open_links=2)
+    assert results == ["1", "2", "3", "4"]
+    assert sorted(site.requested) == ["1", "2", "3", "4"]
+    assert "/Tournament/3" not in cache and "/Tournament/4" not in cache
+
+    site = Site()
+    load_series(site, "", LINKS, lambda content: content.decode(), cache, max_workers=1, open_links=2)
+    assert sorted(site.requested) == ["3", "4"]
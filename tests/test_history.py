@@ -0,0 +1,42 @@
+'''
+Место игрока после последней серии по истории (rank_at) совпадает с текущим местом (rank),
+в том числе когда рейтинги различаются только за пределами точности float32.
+С общим реестром игроков равный рейтинг делится по порядку появления в сезоне, а не в реестре.
+
+    python -m pytest -q tests
+'''
+from mafiauniverse.engine import RatingEngine
+from mafiauniverse.players import PlayerRegistry
+
+
+class Points():
+    '''Формула, в которой изменение рейтинга - баллы за серию.'''
+    series_columns = ['Tour', 'Nick', 'Place', 'Points', 'Dops']
+
+    def __call__(self, before, series):
+        return series.points, {}
+
+
+def test_rank_at_last_series_matches_rank():
+    engine = RatingEngine(Points())
+    # 133.33333333333331 и 133.33333333333334 в float32 - одно и то же число
+    engine.apply_series(1, ["Второй", "Первый"], [2, 1], [33.33333333333331, 100 / 3], [0, 0])
+    engine.apply_series(2, ["Третий"], [1], [10.0], [0])
+    for nick in ("Первый", "Второй", "Третий"):
+        assert engine.rank_at(nick, 1) == engine.rank(nick)
+    assert [nick for nick, _ in engine.ranking_at(1)] == [row[0] for row in engine.standings()]
+    assert engine.timeline("Первый")['rating'].tolist() == [100 + 100 / 3]
+
+
+
+def test_shared_registry_ties_by_season_order():
+    registry = PlayerRegistry()
+    # игроки уже есть в реестре в другом порядке (другой сезон или клуб)
+    registry.ids(["Игрок 30", "Игрок 25", "Игрок 28", "Игрок 24", "Чужой"])
+    engine = RatingEngine(Points(), registry=registry)
+    engine.apply_series(1, ["Игрок 28", "Игрок 30", "Игрок 24", "Игрок 25"], [1, 2, 3, 4], [5.0, 5.0, 0.0, 0.0],
+                        [0, 0, 0, 0])
+    assert [row[0] for row in engine.standings()] == ["Игрок 28", "Игрок 30", "Игрок 24", "Игрок 25"]
+    assert engine.rank("игрок 30") == 2
+    assert engine.rank("Чужой") is None
+    assert engine.as_dict(engine.tours_count) == {"Игрок 28": 1, "Игрок 30": 1, "Игрок 24": 1, "Игрок 25": 1}
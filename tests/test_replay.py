@@ -0,0 +1,34 @@
+'''
+Запись ответов через RecordingSession и их воспроизведение ReplayServer дают одни и те же
+ключи запросов, в том числе для поиска, форма которого уходит телом в байтах.
+
+    python -m pytest -q tests
+'''
+import requests
+
+from mafiauniverse.replay import Recording, RecordingSession, ReplayServer
+from mafiauniverse.search import search_series
+
+HTML = "text/html; charset=utf-8"
+TOKEN_PAGE = b'<html><form><input name="__RequestVerificationToken" value="token"/></form></html>'
+
+
+def test_search_round_trip(tmp_path):
+    site = Recording(str(tmp_path / "site"))
+    site.add("GET /SerieOfTournaments/", 200, HTML, TOKEN_PAGE)
+    for name in ("Энтропия", "Магистрейтик"):
+        site.add(f"POST /SerieOfTournaments/Search searchText={name}", 200, HTML, f"<p>{name}</p>".encode())
+
+    recording = Recording(str(tmp_path / "recorded"))
+    with ReplayServer(site) as server:
+        session = RecordingSession(recording)
+        for name in ("Энтропия", "Магистрейтик"):
+            search_series(session, server.url, name)
+        assert not server.misses
+    recording.save()
+
+    with ReplayServer(Recording(str(tmp_path / "recorded"))) as server:
+        for name in ("Энтропия", "Магистрейтик"):
+            response = search_series(requests.Session(), server.url, name)
+            assert response.content == f"<p>{name}</p>".encode()
+        assert not server.misses
@@ -0,0 +1,110 @@
+'''
+Снимок сезона: продолжение расчета скачивает только новые серии и дает тот же рейтинг,
+что и полный пересчет; правка серии задним числом и смена списка серий ведут к пересчету.
+Восстановленный с другим реестром игроков сезон продолжает считаться по никам,
+а не по номерам реестра, с которыми снимок был сохранен.
+
+    python -m pytest -q tests
+'''
+from types import SimpleNamespace
+
+from entropy.rating import Season
+from mafiauniverse.engine import RatingEngine
+from mafiauniverse.players import PlayerRegistry
+from mafiauniverse.snapshot import SeasonSnapshot, load_snapshot, save_snapshot
+
+
+class Page():
+    def __init__(self, content: bytes):
+        self.content = content
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+class SeasonSite():
+    '''Сайт с сезоном из series серий; edited - номер серии, результаты которой поправлены.'''
+
+    def __init__(self, series: int, edited: int = None):
+        self.series = list(range(1, series + 1))
+        self.edited = edited
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        self.requested.append(url)
+        path = url.split("mafiauniverse.org", 1)[1]
+        if path.startswith("/SerieOfTournament/Tournaments/"):
+            links = "".join(f'<a class="fw-bold" href="/Tournament/{i}">Серия {i}</a>' for i in reversed(self.series))
+            return Page(f"<html><body>{links}</body></html>".encode())
+        number = int(path.rsplit("/", 1)[1])
+        rows = ""
+        for place in range(1, 5):
+            dops = 2 if number == self.edited else 1
+            cells = [place, f"Игрок {(place + number) % 6}", f"{place * number},5", f"{dops},0"] + ["-"] * 5 + \
+                [f"{place} / 10"]
+            rows += "<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>"
+        return Page(f"<html><head><title>Серия {number}</title></head><body><table id='TournResultsTable'>"
+                    f"<tbody>{rows}</tbody></table></body></html>".encode())
+
+
+def open_test_season(site: SeasonSite, path: str) -> Season:
+    return Season(site, 1, max_workers=1, snapshot_path=path, registry=PlayerRegistry())
+
+
+def test_resume_fetches_only_new_series(tmp_path):
+    path = str(tmp_path / "season.pickle")
+    open_test_season(SeasonSite(8), path)
+    site = SeasonSite(10)
+    season = open_test_season(site, path)
+    # последняя серия снимка могла еще идти, поэтому перечитывается вместе с двумя новыми
+    assert sorted(url.rsplit("/", 1)[1] for url in site.requested[1:]) == ["10", "8", "9"]
+    full = Season(SeasonSite(10), 1, max_workers=1, registry=PlayerRegistry())
+    assert season.current_rating == full.current_rating
+    assert season.TOURS_COUNT == full.TOURS_COUNT
+    assert len(season.engine.log) == len(full.engine.log)
+
+
+def test_changed_series_rebuild(tmp_path):
+    path = str(tmp_path / "season.pickle")
+    open_test_season(SeasonSite(8), path)
+    # список серий сменился не только в конце: снимок не годится
+    site = SeasonSite(8)
+    site.series.remove(3)
+    assert open_test_season(site, path).current_rating == \
+        Season(site, 1, max_workers=1, registry=PlayerRegistry()).current_rating
+    assert len(site.requested) == 1 + 7 + 1 + 7
+
+    # правка серии задним числом видна при сверке с сайтом
+    before = open_test_season(SeasonSite(8), path).current_rating
+    site = SeasonSite(8, edited=2)
+    season = Season(site, 1, max_workers=1, snapshot_path=path, registry=PlayerRegistry(), calculate=False)
+    season.revalidate_ttl = 0
+    season.refresh(site)
+    assert season.current_rating != before
+    assert season.current_rating == Season(SeasonSite(8, edited=2), 1, max_workers=1,
+                                           registry=PlayerRegistry()).current_rating
+
+
+class Points():
+    '''Формула, в которой изменение рейтинга - баллы за серию.'''
+    series_columns = ['Tour', 'Nick', 'Place', 'Points', 'Dops']
+
+    def __call__(self, before, series):
+        return series.points, {}
+
+
+def test_restore_into_other_registry(tmp_path):
+    engine = RatingEngine(Points(), registry=PlayerRegistry())
+    engine.apply_series(1, ["Alice", "Bob"], [1, 2], [20.0, 10.0], [0, 0])
+    path = str(tmp_path / "season.pickle")
+    save_snapshot(path, SeasonSnapshot.capture(SimpleNamespace(engine=engine), {}, ["/1"], ["digest"], 0.0))
+
+    # новый реестр (например, players.json пересоздан) нумерует игроков иначе
+    registry = PlayerRegistry()
+    registry.ids(["Carol", "Bob"])
+    season = SimpleNamespace(engine=RatingEngine(Points(), registry=registry))
+    assert load_snapshot(path).restore(season)
+    season.engine.apply_series(2, ["Carol", "alice"], [1, 2], [30.0, 5.0], [0, 0])
+    assert season.engine.as_dict(season.engine.tours_count) == {"Alice": 2, "Bob": 1, "Carol": 1}
+    assert season.engine.as_dict(season.engine.rating) == {"Alice": 125.0, "Bob": 110.0, "Carol": 130.0}
@@ -0,0 +1,85 @@
+'''
+Сверка разбора TournResultsTable (mafiauniverse.tables) с прежним разбором через BeautifulSoup
+на сохраненных страницах серий, в том числе на странице без колонки побед/игр:
+backfill сохраняет такую серию, а формула Энтропии ее не сворачивает.
+
+    python -m pytest -q tests
+'''
+import os
+import re
+
+import pytest
+from bs4 import BeautifulSoup
+
+from mafiauniverse.backfill import parse_results_page
+from mafiauniverse.engine import EntropyFormula, RatingEngine
+from mafiauniverse.tables import extract_results
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+NUMBER = re.compile("[0-9]+")
+
+
+def read_page(name: str) -> bytes:
+    with open(os.path.join(DATA, name), "rb") as f:
+        return f.read()
+
+
+def reference_entropy(html_content: bytes):
+    '''Прежний разбор из entropy/rating.py: место, ник, баллы, допы, победы, игры.'''
+    soup = BeautifulSoup(html_content, "html.parser")
+    result_table = soup.find("table", {"id": "TournResultsTable"})
+    rows = []
+    for row in result_table.find('tbody').find_all('tr'):
+        elements = list(map(lambda x: x.text.strip(), row.find_all('td')))
+        wins = int(NUMBER.findall(elements[9])[0])
+        games = int(NUMBER.findall(elements[9])[1])
+        rows.append((int(elements[0]), elements[1], float(elements[2].replace(',', '.')),
+                     float(elements[3].replace(',', '.')), wins, games))
+    return soup.title.text, rows
+
+
+def reference_magistraytik(html_content: bytes):
+    '''Прежний разбор из magistraytik/rating_new_scoring.py: место, ник, баллы, допы.'''
+    soup = BeautifulSoup(html_content, "html.parser")
+    result_table = soup.find("table", {"id": "TournResultsTable"})
+    rows = []
+    for row in result_table.find('tbody').find_all('tr'):
+        elements = list(map(lambda x: x.text.strip(), row.find_all('td')))
+        rows.append((int(elements[0]), elements[1], float(elements[2].replace(',', '.')),
+                     float(elements[3].replace(',', '.'))))
+    return rows
+
+
+@pytest.mark.parametrize("name", ["series_full.html", "series_short.html"])
+def test_magistraytik_columns_match_reference(name):
+    page = read_page(name)
+    _, rows = extract_results(page, games=False)
+    assert [tuple(row[:4]) for row in rows] == reference_magistraytik(page)
+
+
+def test_full_page_matches_reference():
+    page = read_page("series_full.html")
+    title, rows = extract_results(page)
+    reference_title, reference_rows = reference_entropy(page)
+    assert title == reference_title
+    assert [tuple(row) for row in rows] == reference_rows
+
+
+def test_short_rows_are_rejected():
+    page = read_page("series_short.html")
+    with pytest.raises(IndexError):
+        reference_entropy(page)
+    with pytest.raises(RuntimeError):
+        extract_results(page)
+
+
+def test_backfill_keeps_short_rows():
+    _, rows = parse_results_page(read_page("series_short.html"))
+    assert [tuple(row[:4]) for row in rows] == reference_magistraytik(read_page("series_short.html"))
+    assert all(row.games == 0 for row in rows)
+    engine = RatingEngine(EntropyFormula({1: 0}))
+    with pytest.raises(RuntimeError):
+        engine.apply_series(1, [row.nick for row in rows], [row.place for row in rows],
+                            [row.points for row in rows], [row.dops for row in rows],
+                            [row.wins for row in rows], [row.games for row in rows])
+    assert engine.standings() == [] and len(engine.log) == 0